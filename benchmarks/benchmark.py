@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures latency, throughput and peak memory of comparison, alignment and
+# OCR functions on synthetic and bundled screenshots.
+# Run: python benchmarks/benchmark.py [--json results.json]
+
+import json
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from glob import glob
+from os import path
+from platform import platform, python_version
+from time import perf_counter
+
+import numpy as np
+from PIL import Image as img
+
+ROOT_PATH = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+# pylint: disable=wrong-import-position
+from detailist_core import (
+    HeatmapDiff,
+    SsimDiff,
+    TesseractOcr,
+    calculate_opacity_diff,
+    calculate_simple_diff,
+    get_image_shift,
+    get_template_position,
+    get_tesseract_path,
+)
+
+SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160), "6880x2880": (6880, 2880)}
+CASES = [
+    "heatmap",
+    "ssim",
+    "opacity",
+    "simple",
+    "align_shift",
+    "align_template",
+    "ocr",
+]
+SCREENSHOTS_PATH = path.join(ROOT_PATH, "docs", "assets", "img")
+COMPARISON_STRENGHT = 20
+# Second screenshot is the first one scrolled by this offset with a changed area.
+SHIFT_X = 7
+SHIFT_Y = 5
+
+
+def get_synthetic_screenshot(width, heigh):
+    # White page with dark text-like lines and a few colored panels.
+    random = np.random.default_rng(0)
+    img_data = np.full((heigh, width, 3), 255, dtype=np.uint8)
+    for _ in range(width * heigh // 200000):
+        left = int(random.integers(0, width - 200))
+        top = int(random.integers(0, heigh - 100))
+        img_data[top : top + 100, left : left + 200] = random.integers(0, 256, 3)
+    for line_top in range(8, heigh - 16, 24):
+        line_width = int(random.integers(width // 4, width - 16))
+        letters = random.random((12, line_width)) < 0.35
+        img_data[line_top : line_top + 12, 8 : 8 + line_width][letters] = 32
+
+    return img_data
+
+
+def get_bundled_screenshot(file_path, width, heigh):
+    # Bundled screenshot tiled to the size.
+    with img.open(file_path) as image:
+        tile_data = np.asarray(image.convert("RGB"))
+    tile_heigh, tile_width = tile_data.shape[:2]
+    repeats = (-(-heigh // tile_heigh), -(-width // tile_width), 1)
+
+    return np.ascontiguousarray(np.tile(tile_data, repeats)[:heigh, :width])
+
+
+def get_screenshot_pair(img_data):
+    heigh, width = img_data.shape[:2]
+    img_data_2 = np.roll(img_data, (SHIFT_Y, SHIFT_X), axis=(0, 1))
+    img_data_2[heigh // 3 : heigh // 3 + 40, width // 3 : width // 3 + 300] = (
+        200,
+        30,
+        30,
+    )
+
+    return img_data, img_data_2
+
+
+def get_sources(source_names, width, heigh):
+    sources = []
+    if "synthetic" in source_names:
+        sources.append(("synthetic", get_synthetic_screenshot(width, heigh)))
+    if "bundled" in source_names:
+        for file_path in sorted(glob(path.join(SCREENSHOTS_PATH, "*_screen.png"))):
+            sources.append(
+                (
+                    path.splitext(path.basename(file_path))[0],
+                    get_bundled_screenshot(file_path, width, heigh),
+                )
+            )
+
+    return sources
+
+
+def get_case_function(case, img_data_1, img_data_2, ocr):
+    # Returns function and the number of processed pixels, viewport sizes
+    # are the same as in application: one third of screen heigh.
+    heigh, width = img_data_1.shape[:2]
+    viewport_size = heigh // 3
+    viewport_1 = img_data_1[:viewport_size, :viewport_size]
+    viewport_2 = img_data_2[
+        SHIFT_Y : SHIFT_Y + viewport_size, SHIFT_X : SHIFT_X + viewport_size
+    ]
+
+    if case == "heatmap":
+        heatmap_diff = HeatmapDiff()
+        return (
+            lambda: heatmap_diff.calculate(img_data_1, img_data_2, COMPARISON_STRENGHT),
+            width * heigh,
+        )
+    if case == "ssim":
+        ssim_diff = SsimDiff()
+        return (
+            lambda: ssim_diff.calculate(img_data_1, img_data_2, COMPARISON_STRENGHT),
+            width * heigh,
+        )
+    if case == "opacity":
+        return (
+            lambda: calculate_opacity_diff(img_data_1, img_data_2, COMPARISON_STRENGHT),
+            width * heigh,
+        )
+    if case == "simple":
+        return lambda: calculate_simple_diff(img_data_1, img_data_2), width * heigh
+    if case == "align_shift":
+        return lambda: get_image_shift(img_data_1, img_data_2), width * heigh
+    if case == "align_template":
+        return lambda: get_template_position(viewport_1, img_data_2), width * heigh
+    if case == "ocr":
+        return lambda: ocr.get_text(viewport_2), viewport_size * viewport_size
+
+    raise ValueError(f"Unknown case: {case}")
+
+
+def measure(function, pixels, repeats):
+    # Peak memory is measured in a separate run, tracing slows down timing.
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+    tracemalloc.stop()
+
+    durations = []
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        durations.append(perf_counter() - start)
+    durations_ms = np.array(durations) * 1000
+
+    return {
+        "repeats": repeats,
+        "min_ms": float(durations_ms.min()),
+        "mean_ms": float(durations_ms.mean()),
+        "p50_ms": float(np.percentile(durations_ms, 50)),
+        "p90_ms": float(np.percentile(durations_ms, 90)),
+        "p99_ms": float(np.percentile(durations_ms, 99)),
+        "megapixels_per_s": pixels / 1e6 / float(np.median(durations)),
+        "peak_memory_mb": peak_memory / 1024 / 1024,
+    }
+
+
+def get_ocr(cases):
+    if "ocr" not in cases:
+        return None, None
+
+    ocr = TesseractOcr(get_tesseract_path(path.join(ROOT_PATH, "tesseract")))
+    try:
+        ocr.get_text(np.full((32, 32, 3), 255, dtype=np.uint8))
+    except OSError as error:
+        return None, f"Tesseract is not available: {error}"
+
+    return ocr, None
+
+
+def get_arguments():
+    parser = ArgumentParser(description="Benchmark Detailist core functions.")
+    parser.add_argument(
+        "--sizes", nargs="+", choices=list(SIZES), default=list(SIZES)
+    )
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        choices=["synthetic", "bundled"],
+        default=["synthetic", "bundled"],
+    )
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument(
+        "--ocr-repeats", type=int, default=3, help="OCR is much slower than diffs."
+    )
+    parser.add_argument("--json", help="Save results to JSON file.")
+
+    return parser.parse_args()
+
+
+def main():
+    arguments = get_arguments()
+    ocr, ocr_error = get_ocr(arguments.cases)
+    results = []
+
+    print(
+        f"{'Case':<16}{'Source':<18}{'Size':<11}{'p50, ms':>9}{'p90, ms':>9}"
+        f"{'MP/s':>9}{'Peak, MB':>10}"
+    )
+    for size_name in arguments.sizes:
+        width, heigh = SIZES[size_name]
+        for source_name, img_data in get_sources(arguments.sources, width, heigh):
+            img_data_1, img_data_2 = get_screenshot_pair(img_data)
+            for case in arguments.cases:
+                result = {"case": case, "source": source_name, "size": size_name}
+                if case == "ocr" and ocr is None:
+                    result["skipped"] = ocr_error
+                    results.append(result)
+                    continue
+
+                function, pixels = get_case_function(case, img_data_1, img_data_2, ocr)
+                repeats = arguments.ocr_repeats if case == "ocr" else arguments.repeats
+                result.update(measure(function, pixels, repeats))
+                results.append(result)
+                print(
+                    f"{case:<16}{source_name:<18}{size_name:<11}"
+                    f"{result['p50_ms']:>9.1f}{result['p90_ms']:>9.1f}"
+                    f"{result['megapixels_per_s']:>9.1f}"
+                    f"{result['peak_memory_mb']:>10.1f}"
+                )
+
+    if ocr_error:
+        print(ocr_error)
+
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf8") as json_file:
+            json.dump(
+                {
+                    "python": python_version(),
+                    "numpy": np.__version__,
+                    "platform": platform(),
+                    "results": results,
+                },
+                json_file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares fused HeatmapDiff with the previous HSV based heatmap, and
+# incremental heatmap updates with calculating the whole heatmap again.
+# Run: python benchmarks/heatmap_benchmark.py
+
+import sys
+from os import path
+from time import perf_counter
+
+import numpy as np
+from PIL import Image as img
+from PIL import ImageChops as ic
+
+ROOT_PATH = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+from detailist_core import HeatmapDiff, translation  # pylint: disable=wrong-import-position
+
+SIZES = [("1080p", 1920, 1080), ("4K", 3840, 2160), ("6880x2880", 6880, 2880)]
+REPEATS = 5
+COMPARISON_STRENGHT = 20
+BUNDLED_SCREENSHOTS = ["data_screen", "ocr_screen", "photo_screen", "simple_screen"]
+# Application viewport on 4K screen: one third of screen heigh.
+VIEW_SIZE = 720
+
+
+def calculate_hsv_heatmap_diff(image_1, image_2, comparison_strenght):
+    image_diff = ic.difference(image_1, image_2)
+
+    image_data = np.array(image_diff.convert("HSV"))
+    image_data[:, :, 0] = 0
+    image_data[:, :, 1] = 255
+    _, _, value = image_data.T
+
+    translated_strenght = translation(comparison_strenght, 1, 100, 0, 255)
+    strenght_mask = value < int(translated_strenght)
+    image_data[strenght_mask.T] = (0, 0, 0)
+
+    return img.fromarray(image_data, "HSV").convert("RGB")
+
+
+def get_screenshots(width, heigh):
+    random = np.random.default_rng(0)
+    img_data_1 = random.integers(0, 256, (heigh, width, 3), dtype=np.uint8)
+    img_data_2 = img_data_1.copy()
+    img_data_2[heigh // 4 : heigh // 2, width // 4 : width // 2] //= 2
+
+    return img_data_1, img_data_2
+
+
+def get_duration(function, *args):
+    function(*args)
+    durations = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        function(*args)
+        durations.append(perf_counter() - start)
+
+    return min(durations)
+
+
+def get_updates(screenshot_data, update):
+    # Left and right views with their keys, as application requests them on
+    # every update. Left view stays, right view is nudged by one pixel or
+    # replaced by a new capture with one changed line of text.
+    view_1 = screenshot_data[:VIEW_SIZE, :VIEW_SIZE]
+    if update == "nudge":
+        views_2 = [
+            screenshot_data[8 : 8 + VIEW_SIZE, x_pos : x_pos + VIEW_SIZE]
+            for x_pos in (8, 9)
+        ]
+    else:
+        changed_data = screenshot_data.copy()
+        changed_data[300:330, 100:400] = 255 - changed_data[300:330, 100:400]
+        views_2 = [
+            img_data[8 : 8 + VIEW_SIZE, 8 : 8 + VIEW_SIZE]
+            for img_data in (screenshot_data, changed_data)
+        ]
+
+    return [(view_1, view_2, ("left", index)) for index, view_2 in enumerate(views_2)]
+
+
+def get_update_duration(updates, is_incremental):
+    # The first keyed call calculates the whole heatmap and is not counted.
+    heatmap_diff = HeatmapDiff()
+    durations = []
+    for index in range(REPEATS * 2 + 1):
+        view_1, view_2, magnitude_key = updates[index % len(updates)]
+        start = perf_counter()
+        heatmap_diff.calculate(
+            view_1,
+            view_2,
+            COMPARISON_STRENGHT,
+            magnitude_key if is_incremental else None,
+        )
+        if index:
+            durations.append(perf_counter() - start)
+
+    return min(durations)
+
+
+def print_updates():
+    print(f"{'Screenshot':<16}{'Update':<12}{'Full, ms':>10}{'Updated, ms':>13}")
+    for screenshot_name in BUNDLED_SCREENSHOTS:
+        screenshot_path = path.join(
+            ROOT_PATH, "docs", "assets", "img", screenshot_name + ".png"
+        )
+        with img.open(screenshot_path) as image:
+            screenshot_data = np.asarray(image.convert("RGB"))
+
+        for update in ("nudge", "recapture"):
+            updates = get_updates(screenshot_data, update)
+            full_duration = get_update_duration(updates, False)
+            updated_duration = get_update_duration(updates, True)
+            print(
+                f"{screenshot_name:<16}{update:<12}{full_duration * 1000:>10.1f}"
+                f"{updated_duration * 1000:>13.1f}"
+            )
+
+
+def main():
+    heatmap_diff = HeatmapDiff()
+    print(f"{'Size':<12}{'HSV, ms':>10}{'Fused, ms':>12}{'Speedup':>10}")
+    for size_name, width, heigh in SIZES:
+        img_data_1, img_data_2 = get_screenshots(width, heigh)
+        image_1 = img.fromarray(img_data_1, "RGB")
+        image_2 = img.fromarray(img_data_2, "RGB")
+
+        expected = np.asarray(
+            calculate_hsv_heatmap_diff(image_1, image_2, COMPARISON_STRENGHT)
+        )
+        actual = heatmap_diff.calculate(img_data_1, img_data_2, COMPARISON_STRENGHT)
+        if not np.array_equal(expected, actual):
+            print(f"{size_name}: fused heatmap differs from HSV heatmap!")
+
+        hsv_duration = get_duration(
+            calculate_hsv_heatmap_diff, image_1, image_2, COMPARISON_STRENGHT
+        )
+        fused_duration = get_duration(
+            heatmap_diff.calculate, img_data_1, img_data_2, COMPARISON_STRENGHT
+        )
+        print(
+            f"{size_name:<12}{hsv_duration * 1000:>10.1f}{fused_duration * 1000:>12.1f}"
+            f"{hsv_duration / fused_duration:>9.1f}x"
+        )
+
+    print()
+    print_updates()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures cold start of Detailist modules in fresh interpreters.
+# Run: python benchmarks/startup_benchmark.py [--app]
+
+import sys
+from argparse import ArgumentParser
+from os import path
+from statistics import median
+from subprocess import DEVNULL, PIPE, run
+from time import perf_counter
+
+ROOT_PATH = path.dirname(path.dirname(path.abspath(__file__)))
+REPEATS = 7
+STATEMENTS = [
+    ("python", "pass"),
+    ("detailist_core", "import detailist_core"),
+    ("detailist_canvas", "import detailist_canvas"),
+    ("detailist_app", "import detailist_app"),
+]
+APP_STATEMENT = (
+    "DetailistApp",
+    "from detailist_app import DetailistApp; DetailistApp().stop()",
+)
+
+
+def get_duration(statement):
+    # Returns median run time or error message of the first failed run.
+    durations = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        process = run(
+            [sys.executable, "-c", statement],
+            cwd=ROOT_PATH,
+            stdout=DEVNULL,
+            stderr=PIPE,
+            check=False,
+            encoding="utf8",
+        )
+        durations.append(perf_counter() - start)
+        if process.returncode != 0:
+            error_lines = process.stderr.strip().splitlines()
+            return None, error_lines[-1] if error_lines else "Failed."
+
+    return median(durations), None
+
+
+def main():
+    parser = ArgumentParser(description="Measure Detailist startup time.")
+    parser.add_argument(
+        "--app", action="store_true", help="Also create and stop DetailistApp."
+    )
+    arguments = parser.parse_args()
+
+    statements = STATEMENTS + ([APP_STATEMENT] if arguments.app else [])
+    print(f"{'Startup':<16}{'Total, ms':>12}{'Import, ms':>12}")
+    baseline = None
+    for name, statement in statements:
+        duration, error = get_duration(statement)
+        if error:
+            print(f"{name:<16}{'-':>12}{'-':>12}  {error}")
+            continue
+
+        if baseline is None:
+            baseline = duration
+        print(f"{name:<16}{duration * 1000:>12.1f}{(duration - baseline) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
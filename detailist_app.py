@@ -12,21 +12,47 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import sys
-from io import BytesIO
 from base64 import b64encode
-from threading import Timer
-from difflib import SequenceMatcher
-from os import remove, scandir, path, makedirs
-from subprocess import Popen
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count, environ, path, makedirs
+from time import localtime, strftime, time
 
 import numpy as np
 import PySimpleGUI as gui
-from keyboard import add_hotkey
-from psgtray import SystemTray
 from PIL import Image as img
-from PIL import ImageGrab as ig
-from PIL import ImageChops as ic
+
+from detailist_canvas import CanvasTiles
+from detailist_capture import (
+    get_active_window_box,
+    get_cursor_monitor_box,
+    get_frame_data,
+    grab_frame,
+)
+from detailist_core import (
+    COMPARISON_MODES,
+    OCR_MODES,
+    HeatmapDiff,
+    LruCache,
+    SsimDiff,
+    TesseractOcr,
+    calculate_simple_diff,
+    draw_region_boxes,
+    get_bands_text,
+    get_changes_text,
+    get_data_hash,
+    get_diff_metrics,
+    get_image_shift,
+    get_template_position,
+    get_tesseract_path,
+    is_near_shift,
+    translation,
+)
+from detailist_history import CaptureHistory
+from detailist_profile import Profiler
+from detailist_watch import ScreenWatch
+from detailist_workers import LatestWorker, QueueWorker
 
 
 class DetailistApp:
@@ -40,13 +66,35 @@ class DetailistApp:
         self.graph_diff_key = "graph_diff"
         self.comparison_mode_key = "comparison_mode"
         self.comparison_strenght_key = "comparison_strenght"
+        self.ocr_mode_key = "ocr_mode"
+        self.region_boxes_key = "region_boxes"
+        self.diff_metrics_key = "diff_metrics"
         self.screenshot_width_key = "screenshot_width"
         self.screenshot_heigh_key = "screenshot_heigh"
         self.text_block_key = "text_block"
+        self.diff_result_key = "diff_result"
+        self.ocr_result_key = "ocr_result"
+        self.screenshot_key = "screenshot"
+        self.history_1_key = "history_1"
+        self.history_2_key = "history_2"
+        self.watch_key = "watch"
 
         self.is_screenshot_1 = False
         self.is_screenshot_2 = False
-        self.is_diff_in_progress = False
+        # Captured screenshots are kept as full resolution RGB arrays.
+        self.screenshot_1_data = None
+        self.screenshot_2_data = None
+        self.screenshot_diff = None
+        # Every captured screenshot gets a new history id, cached results use it.
+        self.screenshot_1_id = None
+        self.screenshot_2_id = None
+        # Captured screen areas, None for the whole screen. The last monitor
+        # or window area is remembered to capture it again.
+        self.screenshot_1_box = None
+        self.screenshot_2_box = None
+        self.capture_box = None
+        self.screenshot_1_time = None
+        self.screenshot_2_time = None
         self.is_center_in_progress = False
 
         self.visible_window = self.about_window_key
@@ -57,10 +105,32 @@ class DetailistApp:
         self.screenshot_size = (self.screen_one_third_h, self.screen_one_third_h)
         self.comparison_strenght = 20
         self.comparison_mode = "Heatmap"
+        self.is_region_boxes = False
         # Max screen resolution: 6880, 2880. Aspect ratio: 16:9.
         # scrollregion must be explicitly defined for canvas.xview() to work.
         self.max_width = 6880
         self.max_heigh = 2880
+        self.diff_cache_size = 128 * 1024 * 1024
+        self.ocr_language = "eng"
+        self.ocr_mode = "Full"
+        self.ocr_cache_size = 4 * 1024 * 1024
+        self.is_ocr_cache_saved = True
+        # Newest history screenshots are kept as arrays, older are compressed
+        # and the oldest are spilled to tmp files.
+        self.history_count = 100
+        self.history_size = 1024 * 1024 * 1024
+        self.history_compressed_size = 512 * 1024 * 1024
+        # Watch compares the first screenshot area with the screen.
+        self.watch = None
+        self.watch_frame_rate = 2
+        self.watch_min_changed_pixels = 64
+        # Diff, capture, alignment and OCR stages are timed, Stats shows the
+        # summary. DETAILIST_PROFILE_LOG appends every timing as JSON line,
+        # DETAILIST_TRACE_MEMORY traces peak memory but slows everything.
+        self.profiler = Profiler(
+            environ.get("DETAILIST_PROFILE_LOG"),
+            bool(environ.get("DETAILIST_TRACE_MEMORY")),
+        )
 
         # Default font: ("Helvetica", 11)
         self.title_font = ("Helvetica", 14)
@@ -69,8 +139,8 @@ class DetailistApp:
 
         self.init_assets()
         self.init_gui()
-        self.init_graphs()
         self.init_tray()
+        self.init_workers()
         self.init_hotkeys()
 
     def init_assets(self):
@@ -81,18 +151,14 @@ class DetailistApp:
             detailist_path = "."
         self.assets_path = detailist_path + "/assets/"
         self.ocr_path = detailist_path + "/tesseract/"
+        self.tesseract_path = get_tesseract_path(self.ocr_path)
         self.tmp_path = detailist_path + "/tmp/"
         if not path.exists(self.tmp_path):
             makedirs(self.tmp_path)
 
-        with open(self.assets_path + "LICENSES.txt", encoding="utf8") as licenses_file:
-            self.licenses_text = licenses_file.read()
-
         self.icons_path = self.assets_path + "icons/"
         with open(self.assets_path + "detailist_icon.png", "rb") as image:
             self.detailist_icon = b64encode(image.read())
-        with open(self.assets_path + "detailist_small_icon.png", "rb") as image:
-            self.detailist_small_icon = b64encode(image.read())
 
     def get_diff_window(self):
         button_color = (gui.theme_background_color(), gui.theme_background_color())
@@ -136,6 +202,14 @@ class DetailistApp:
                                 tooltip="Clear",
                                 key="clear_graph_1",
                             ),
+                            gui.Combo(
+                                [],
+                                size=(22, 6),
+                                enable_events=True,
+                                key=self.history_1_key,
+                                tooltip="Screenshot History",
+                                readonly=True,
+                            ),
                         ],
                         [
                             gui.Graph(
@@ -185,6 +259,14 @@ class DetailistApp:
                                 tooltip="Clear",
                                 key="clear_graph_2",
                             ),
+                            gui.Combo(
+                                [],
+                                size=(22, 6),
+                                enable_events=True,
+                                key=self.history_2_key,
+                                tooltip="Screenshot History",
+                                readonly=True,
+                            ),
                         ],
                         [
                             gui.Graph(
@@ -254,11 +336,12 @@ class DetailistApp:
                             gui.Button(
                                 button_text="Resize", tooltip="Resize Screenshot"
                             ),
+                            gui.Button(button_text="Stats", tooltip="Show Timings"),
                         ],
                         [
                             gui.Text("Comparison:"),
                             gui.Combo(
-                                ["Heatmap", "Opacity", "Simple Diff"],
+                                list(COMPARISON_MODES),
                                 size=(8, 6),
                                 enable_events=True,
                                 key=self.comparison_mode_key,
@@ -266,6 +349,25 @@ class DetailistApp:
                                 tooltip="Comparison Mode",
                                 readonly=True,
                             ),
+                            gui.Checkbox(
+                                "Boxes",
+                                default=self.is_region_boxes,
+                                enable_events=True,
+                                key=self.region_boxes_key,
+                                tooltip="Draw Boxes Around Changed Regions",
+                            ),
+                        ],
+                        [
+                            gui.Text("OCR:"),
+                            gui.Combo(
+                                list(OCR_MODES),
+                                size=(8, 6),
+                                enable_events=True,
+                                key=self.ocr_mode_key,
+                                default_value=self.ocr_mode,
+                                tooltip="OCR Mode",
+                                readonly=True,
+                            ),
                         ],
                         [
                             gui.Slider(
@@ -279,12 +381,19 @@ class DetailistApp:
                                 tooltip="Comparison Strenght",
                             )
                         ],
+                        [
+                            gui.Text(
+                                size=(int(self.screen_one_third_h // 7.5), 1),
+                                font=self.small_font,
+                                key=self.diff_metrics_key,
+                            )
+                        ],
                         [
                             gui.Multiline(
                                 disabled=True,
                                 size=(int(self.screen_one_third_h // 7.5), 12),
                                 key=self.text_block_key,
-                                default_text='Drag an image using mouse.\nClick on image and move it using arrow keys.\nHold Ctrl while using arrow keys to increase movement speed.\nBored trying to precisely match screenshot positions? Position screenshots approximately and click "Auto Center" button.\nIncrease screenshot text size for better OCR.',
+                                default_text='Drag an image using mouse.\nClick on image and move it using arrow keys.\nHold Ctrl while using arrow keys to increase movement speed.\nBored trying to precisely match screenshot positions? Position screenshots approximately and click "Auto Center" button.\nIncrease screenshot text size for better OCR.\nShift + Print Screen captures monitor under mouse, Ctrl + Shift + Print Screen captures active window, Ctrl + Alt + Shift + Print Screen captures the last captured monitor or window area again.\nCtrl + Alt + W watches the first screenshot area for changes.',
                             )
                         ],
                     ],
@@ -296,8 +405,13 @@ class DetailistApp:
         return diff_window
 
     def get_about_window(self):
+        with open(self.assets_path + "LICENSES.txt", encoding="utf8") as licenses_file:
+            licenses_text = licenses_file.read()
+        with open(self.assets_path + "detailist_small_icon.png", "rb") as image:
+            detailist_small_icon = b64encode(image.read())
+
         about_window = [
-            [gui.Image(self.detailist_small_icon)],
+            [gui.Image(detailist_small_icon)],
             [gui.Text("Detailist", font=self.title_font, p=(0, 0))],
             [
                 gui.Text(
@@ -329,7 +443,7 @@ class DetailistApp:
                 gui.Multiline(
                     disabled=True,
                     size=(self.text_width, 8),
-                    default_text=self.licenses_text,
+                    default_text=licenses_text,
                 )
             ],
         ]
@@ -350,18 +464,17 @@ class DetailistApp:
         gui.set_global_icon(self.detailist_icon)
         self.fix_taskbar_icon()
 
-        about_window = self.get_about_window()
-        diff_window = self.get_diff_window()
-
+        # Window content is built by build_window on first use.
+        self.built_windows = set()
         layout = [
             [
                 gui.Column(
-                    about_window,
+                    [[]],
                     element_justification="center",
                     visible=False,
                     key=self.about_window_key,
                 ),
-                gui.Column(diff_window, visible=False, key=self.diff_window_key),
+                gui.Column([[]], visible=False, key=self.diff_window_key),
             ]
         ]
         self.window = gui.Window(
@@ -375,6 +488,17 @@ class DetailistApp:
 
         self.window.hide()
 
+    def build_window(self, window_key):
+        if window_key in self.built_windows:
+            return
+        self.built_windows.add(window_key)
+
+        if window_key == self.about_window_key:
+            self.window.extend_layout(self.window[window_key], self.get_about_window())
+        elif window_key == self.diff_window_key:
+            self.window.extend_layout(self.window[window_key], self.get_diff_window())
+            self.init_graphs()
+
     def canvas_click(self, event, canvas):
         canvas.scan_mark(event.x, event.y)
         canvas.focus_set()
@@ -449,12 +573,20 @@ class DetailistApp:
         )
 
     def init_graphs(self):
+        self.graph_photos = {}
+
         self.graph_1 = self.window.Element(self.graph_1_key)
         self.init_canvas(self.graph_1.tk_canvas)
 
         self.graph_2 = self.window.Element(self.graph_2_key)
         self.init_canvas(self.graph_2.tk_canvas)
 
+        # Screenshots are uploaded to Tk only in visible tiles.
+        self.graph_tiles = {
+            self.graph_1_key: CanvasTiles(self.graph_1.tk_canvas),
+            self.graph_2_key: CanvasTiles(self.graph_2.tk_canvas),
+        }
+
         self.graph_diff = self.window.Element(self.graph_diff_key)
         self.graph_diff.tk_canvas.config(highlightthickness=1)
 
@@ -471,8 +603,10 @@ class DetailistApp:
             self.graph_diff.draw_text(graph_diff_help_text, graph_help_location)
 
     def init_tray(self):
+        from psgtray import SystemTray
+
         # psgtray throws exception without first empty element.
-        tray_menu = ["", ["Compare Screenshots", "About", "Exit"]]
+        tray_menu = ["", ["Compare Screenshots", "Watch Screen", "About", "Exit"]]
         self.tray = SystemTray(
             tray_menu,
             single_click_events=False,
@@ -481,9 +615,79 @@ class DetailistApp:
             icon=self.detailist_icon,
         )
 
+    def get_cache_summary(self):
+        # Diff cache size is in bytes, OCR cache size is in text characters.
+        summary_lines = []
+        caches = (("diff cache", self.diff_cache), ("ocr cache", self.ocr_cache))
+        for name, cache in caches:
+            stats = cache.get_stats()
+            summary_lines.append(
+                f"{name}: {stats['count']} entries, size {stats['size']}"
+                f" of {stats['max_size']}, {stats['hits']} hits,"
+                f" {stats['misses']} misses, {stats['evictions']} evictions"
+            )
+
+        return "\n".join(summary_lines)
+
+    def init_workers(self):
+        self.diff_request_count = 0
+        self.diff_drawn_id = 0
+        self.diff_cache = LruCache(self.diff_cache_size, self.get_diff_size)
+
+        # Used only from diff worker thread.
+        self.heatmap_diff = HeatmapDiff()
+        self.ssim_diff = SsimDiff()
+        self.opacity_key = None
+        self.opacity_images = None
+        self.history = CaptureHistory(
+            self.history_count,
+            self.history_size,
+            self.history_compressed_size,
+            self.tmp_path,
+        )
+        # Hotkey only grabs a frame, it is converted in capture worker and
+        # shown in GUI thread. Every captured frame is kept.
+        self.capture_worker = QueueWorker(
+            self.get_capture,
+            lambda capture: self.window.write_event_value(self.screenshot_key, capture),
+        )
+        self.diff_worker = LatestWorker(
+            self.get_screenshots_diff,
+            lambda result: self.window.write_event_value(self.diff_result_key, result),
+        )
+
+        # Tesseract is loaded on first OCR and is used only from OCR worker thread.
+        self.ocr = None
+        self.ocr_executor = None
+        self.ocr_cache = LruCache(self.ocr_cache_size)
+        self.ocr_cache_path = self.tmp_path + "ocr_cache.json"
+        if self.is_ocr_cache_saved:
+            self.load_ocr_cache()
+        self.ocr_worker = LatestWorker(
+            self.get_graph_text,
+            lambda text: self.window.write_event_value(self.ocr_result_key, text),
+        )
+
     def init_hotkeys(self):
+        from keyboard import add_hotkey
+
         add_hotkey("ctrl+print screen", self.create_screenshot)
-        add_hotkey("ctrl+alt+print screen", self.clear_screenshot)
+        add_hotkey("shift+print screen", self.create_screenshot, args=("Monitor",))
+        add_hotkey(
+            "ctrl+shift+print screen", self.create_screenshot, args=("Window",)
+        )
+        add_hotkey(
+            "ctrl+alt+shift+print screen",
+            self.create_screenshot,
+            args=("Rectangle",),
+        )
+        add_hotkey(
+            "ctrl+alt+w", lambda: self.window.write_event_value("Watch Screen", None)
+        )
+        add_hotkey(
+            "ctrl+alt+print screen",
+            lambda: self.window.write_event_value("clear_screenshot", None),
+        )
 
     def start(self):
         while True:
@@ -501,6 +705,10 @@ class DetailistApp:
                 self.open_window(self.diff_window_key)
             elif event == "About":
                 self.open_window(self.about_window_key)
+            elif event == "Watch Screen":
+                self.toggle_watch()
+            elif event == self.watch_key:
+                self.show_watch_change(values[event])
             elif event == gui.WIN_CLOSE_ATTEMPTED_EVENT:
                 self.window.hide()
                 self.tray.show_icon()
@@ -512,18 +720,39 @@ class DetailistApp:
                 self.center_as(event)
             elif event == "calculate_diff":
                 self.calculate_screenshots_diff()
+            elif event == self.screenshot_key:
+                self.add_screenshot(values[event])
+            elif event == "clear_screenshot":
+                self.clear_screenshot()
+            elif event in (self.history_1_key, self.history_2_key):
+                self.open_history_screenshot(event, values[event])
+            elif event == self.diff_result_key:
+                self.draw_screenshots_diff(values[event])
             elif event in ("clear_graph_1", "clear_graph_2"):
                 self.clear_graph(event)
             elif event in ("ocr_graph_1", "ocr_graph_2"):
                 self.ocr_graph(event)
+            elif event == self.ocr_result_key:
+                self.window[self.text_block_key].update(values[event])
+            elif event == self.ocr_mode_key:
+                self.ocr_mode = values[self.ocr_mode_key]
             elif event == "auto_center":
                 self.auto_center()
             elif event == self.comparison_strenght_key:
                 self.comparison_strenght = int(values[self.comparison_strenght_key])
-                self.calculate_screenshots_diff()
+                # Simple Diff does not depend on strenght.
+                if self.comparison_mode != "Simple Diff":
+                    self.calculate_screenshots_diff()
             elif event == self.comparison_mode_key:
                 self.comparison_mode = values[self.comparison_mode_key]
                 self.calculate_screenshots_diff()
+            elif event == self.region_boxes_key:
+                self.is_region_boxes = values[self.region_boxes_key]
+                self.calculate_screenshots_diff()
+            elif event == "Stats":
+                self.window[self.text_block_key].update(
+                    self.profiler.get_summary() + "\n" + self.get_cache_summary()
+                )
             elif event == "Resize":
                 self.resize_screenshots(
                     values[self.screenshot_width_key], values[self.screenshot_heigh_key]
@@ -531,37 +760,106 @@ class DetailistApp:
 
         self.stop()
 
-    def get_image_text(self, img_path):
-        ocr_tool_path = self.ocr_path + "tesseract.exe"
-        tmp_text_path = self.tmp_path + "tmp"
-        create_no_window = 0x08000000
-        ocr_proc = Popen(
-            [ocr_tool_path, img_path, tmp_text_path], creationflags=create_no_window
-        )
-        return_code = ocr_proc.wait()
-        if return_code != 0:
-            return "OCR error occurred!"
+    def ocr_graph(self, event):
+        request = {"ocr_mode": self.ocr_mode, "img_data_2": None}
+        if self.ocr_mode == "Changes":
+            # Changed regions are recognized in both screenshots.
+            if not self.is_screenshot_1 or not self.is_screenshot_2:
+                self.tray.show_message("Detailist", "Take both screenshots first!")
+                return
 
-        image_text = ""
-        with open(tmp_text_path + ".txt", encoding="utf8") as image_text_file:
-            image_text = image_text_file.read()
+            request["img_data_1"] = self.get_viewport_data(
+                self.screenshot_1_data, self.get_viewport(self.graph_1)
+            )
+            request["img_data_2"] = self.get_viewport_data(
+                self.screenshot_2_data, self.get_viewport(self.graph_2)
+            )
+            request["comparison_strenght"] = self.comparison_strenght
+        else:
+            if event == "ocr_graph_1":
+                graph = self.graph_1
+                screenshot_data = self.screenshot_1_data
+            elif event == "ocr_graph_2":
+                graph = self.graph_2
+                screenshot_data = self.screenshot_2_data
+            if screenshot_data is None:
+                return
 
+            request["img_data_1"] = self.get_viewport_data(
+                screenshot_data, self.get_viewport(graph)
+            )
+
+        self.ocr_worker.submit(request)
+
+    def get_ocr_key(self, request):
+        ocr_key = [
+            get_data_hash(request["img_data_1"]),
+            self.tesseract_path,
+            self.ocr_language,
+            request["ocr_mode"],
+        ]
+        if request["img_data_2"] is not None:
+            ocr_key.append(get_data_hash(request["img_data_2"]))
+            ocr_key.append(str(request["comparison_strenght"]))
+
+        return "|".join(ocr_key)
+
+    def get_graph_text(self, request):
+        with self.profiler.operation("ocr"):
+            return self.calculate_graph_text(request)
+
+    def calculate_graph_text(self, request):
+        with self.profiler.stage("hash"):
+            ocr_key = self.get_ocr_key(request)
+        image_text = self.ocr_cache.get(ocr_key)
+        if image_text is not None:
+            return image_text
+
+        if self.ocr is None:
+            self.ocr = TesseractOcr(
+                self.tesseract_path, self.ocr_language, self.tmp_path
+            )
+        if self.ocr_executor is None:
+            self.ocr_executor = ThreadPoolExecutor(max_workers=cpu_count())
+        try:
+            with self.profiler.stage(request["ocr_mode"].lower()):
+                image_text = self.get_ocr_text(request)
+        except OSError:
+            return "OCR error occurred!"
+
+        self.ocr_cache.put(ocr_key, image_text)
         return image_text
 
-    def ocr_graph(self, event):
-        if event == "ocr_graph_1":
-            graph = self.graph_1
-        elif event == "ocr_graph_2":
-            graph = self.graph_2
+    def get_ocr_text(self, request):
+        if request["ocr_mode"] == "Bands":
+            return get_bands_text(
+                self.ocr, request["img_data_1"], self.ocr_executor, cpu_count() or 1
+            )
+        if request["ocr_mode"] == "Changes":
+            return get_changes_text(
+                self.ocr,
+                request["img_data_1"],
+                request["img_data_2"],
+                request["comparison_strenght"],
+                self.ocr_executor,
+            )
 
-        graph_image = self.get_element_image(graph)
-        tmp_img_path = self.tmp_path + "tmp.png"
-        graph_image.save(tmp_img_path, format="PNG")
+        return self.ocr.get_text(request["img_data_1"])
 
-        image_text = self.get_image_text(tmp_img_path)
-        self.window[self.text_block_key].update(image_text)
+    def load_ocr_cache(self):
+        try:
+            with open(self.ocr_cache_path, encoding="utf8") as ocr_cache_file:
+                for ocr_key, image_text in json.load(ocr_cache_file):
+                    self.ocr_cache.put(ocr_key, image_text)
+        except (OSError, ValueError, TypeError):
+            self.ocr_cache.clear()
 
-        self.clean_tmp()
+    def save_ocr_cache(self):
+        try:
+            with open(self.ocr_cache_path, "w", encoding="utf8") as ocr_cache_file:
+                json.dump(self.ocr_cache.get_items(), ocr_cache_file)
+        except OSError:
+            pass
 
     def resize_screenshots(self, screenshot_width_input, screenshot_heigh_input):
         if not screenshot_width_input or not screenshot_heigh_input:
@@ -591,16 +889,24 @@ class DetailistApp:
         except ValueError:
             self.tray.show_message("Detailist", "Screenshot size must be a number!")
 
-    def clean_tmp(self):
-        for file in scandir(self.tmp_path):
-            remove(file.path)
-
     def stop(self):
-        self.clean_tmp()
+        self.capture_worker.stop()
+        self.diff_worker.stop()
+        self.ocr_worker.stop()
+        if self.watch is not None:
+            self.watch.stop()
+        self.history.clear()
+        if self.ocr_executor is not None:
+            self.ocr_executor.shutdown(wait=False)
+        if self.ocr is not None:
+            self.ocr.close()
+        if self.is_ocr_cache_saved:
+            self.save_ocr_cache()
         self.tray.close()
         self.window.close()
 
     def open_window(self, next_window):
+        self.build_window(next_window)
         if self.window.alpha_channel == 0:
             self.window.alpha_channel = 1
         self.window[self.visible_window].update(visible=False)
@@ -609,24 +915,6 @@ class DetailistApp:
         self.window.un_hide()
         self.window.bring_to_front()
 
-    def get_pos_diff(self, sequence_1, sequence_2):
-        sequence_matcher = SequenceMatcher(None, sequence_1, sequence_2, autojunk=False)
-        match = sequence_matcher.find_longest_match(
-            0, len(sequence_1), 0, len(sequence_2)
-        )
-        return match.a - match.b
-
-    def get_channel_index(self, img_data):
-        channel_data = img_data.sum(axis=0)[:, 0]
-        if channel_data.sum() != 0:
-            return 0
-
-        channel_data = img_data.sum(axis=0)[:, 2]
-        if channel_data.sum() != 0:
-            return 2
-
-        return 1
-
     def auto_center(self):
         if not self.is_screenshot_1 or not self.is_screenshot_2:
             return
@@ -634,31 +922,48 @@ class DetailistApp:
             return
         self.is_center_in_progress = True
 
-        screenshot_1 = self.get_element_image(self.graph_1)
-        screenshot_2 = self.get_element_image(self.graph_2)
-        img_data_1 = np.array(screenshot_1.convert("HSV"))
-        img_data_2 = np.array(screenshot_2.convert("HSV"))
-
-        channel_index = self.get_channel_index(img_data_1)
-        x_channel_1 = img_data_1.sum(axis=0)[:, channel_index]
-        x_channel_2 = img_data_2.sum(axis=0)[:, channel_index]
-        y_channel_1 = img_data_1.sum(axis=1)[:, channel_index]
-        y_channel_2 = img_data_2.sum(axis=1)[:, channel_index]
-
-        pos_diff_x = self.get_pos_diff(x_channel_1, x_channel_2)
-        pos_diff_y = self.get_pos_diff(y_channel_1, y_channel_2)
-
-        x_pos = self.graph_2.tk_canvas.xview()
-        y_pos = self.graph_2.tk_canvas.yview()
-        if not x_pos or not y_pos:
+        with self.profiler.operation("auto_center"):
+            center_position = self.get_center_position()
+            if center_position is not None:
+                with self.profiler.stage("scroll"):
+                    self.graph_2.tk_canvas.xview_moveto(
+                        round(center_position[0]) / self.max_width
+                    )
+                    self.graph_2.tk_canvas.yview_moveto(
+                        round(center_position[1]) / self.max_heigh
+                    )
+        self.is_center_in_progress = False
+        if center_position is None:
+            self.tray.show_message(
+                "Detailist", "Auto Center could not find matching screenshot parts."
+            )
             return
 
-        self.graph_2.tk_canvas.xview_moveto(x_pos[0] - pos_diff_x / self.max_width)
-        self.graph_2.tk_canvas.yview_moveto(y_pos[0] - pos_diff_y / self.max_heigh)
-        self.is_center_in_progress = False
+        self.calculate_screenshots_diff()
+
+    def get_center_position(self):
+        # Returns the right screenshot position matching the left viewport.
+        with self.profiler.stage("viewport"):
+            img_data_1 = self.get_viewport_data(
+                self.screenshot_1_data, self.get_viewport(self.graph_1)
+            )
+            viewport_2 = self.get_viewport(self.graph_2)
+            img_data_2 = self.get_viewport_data(self.screenshot_2_data, viewport_2)
+        with self.profiler.stage("shift"):
+            image_shift = get_image_shift(img_data_1, img_data_2)
+        if image_shift is not None and is_near_shift(image_shift, *viewport_2[2:]):
+            return viewport_2[0] + image_shift[0], viewport_2[1] + image_shift[1]
+
+        # Screenshots are too far apart or overlap too little for the shift to
+        # be reliable, search the whole right screenshot.
+        with self.profiler.stage("template"):
+            template_position = get_template_position(
+                img_data_1, self.screenshot_2_data
+            )
+        if template_position is None:
+            return None
 
-        # Wait 50 msec for canvas.xview_moveto.
-        Timer(0.05, self.calculate_screenshots_diff).start()
+        return template_position[:2]
 
     def clear_graph(self, event):
         is_clear = gui.popup_yes_no("Are you sure you want to clear screenshot?")
@@ -666,11 +971,15 @@ class DetailistApp:
             return
 
         if event == "clear_graph_1":
-            self.graph_1.erase()
+            self.erase_graph(self.graph_1)
             self.is_screenshot_1 = False
+            self.screenshot_1_data = None
         elif event == "clear_graph_2":
-            self.graph_2.erase()
+            self.erase_graph(self.graph_2)
             self.is_screenshot_2 = False
+            self.screenshot_2_data = None
+        self.diff_cache.clear()
+        self.update_history()
 
     def center_as(self, event):
         if event == "center_as_right":
@@ -688,8 +997,7 @@ class DetailistApp:
         graph.tk_canvas.xview_moveto(x_pos[0])
         graph.tk_canvas.yview_moveto(y_pos[0])
 
-        # Wait 50 msec for canvas.xview_moveto.
-        Timer(0.05, self.calculate_screenshots_diff).start()
+        self.calculate_screenshots_diff()
 
     def center_graph(self, event):
         if event == "center_graph_1":
@@ -700,21 +1008,22 @@ class DetailistApp:
         graph.tk_canvas.xview_moveto(0)
         graph.tk_canvas.yview_moveto(0)
 
-        # Wait 50 msec for canvas.xview_moveto.
-        Timer(0.05, self.calculate_screenshots_diff).start()
+        self.calculate_screenshots_diff()
 
     def save_graph(self, event, save_path):
         if not save_path:
             return
 
         if event == "save_graph_1":
-            graph = self.graph_1
+            graph_image = self.get_viewport_image(self.graph_1)
         elif event == "save_graph_2":
-            graph = self.graph_2
+            graph_image = self.get_viewport_image(self.graph_2)
         elif event == "save_graph_diff":
-            graph = self.graph_diff
+            graph_image = self.screenshot_diff
+
+        if graph_image is None:
+            return
 
-        graph_image = self.get_element_image(graph)
         graph_image.save(save_path, format="PNG")
 
     def clear_screenshot(self):
@@ -723,107 +1032,453 @@ class DetailistApp:
             return
 
         if self.is_screenshot_2:
-            self.graph_2.erase()
+            self.erase_graph(self.graph_2)
             self.is_screenshot_2 = False
+            self.screenshot_2_data = None
         elif self.is_screenshot_1:
-            self.graph_1.erase()
+            self.erase_graph(self.graph_1)
             self.is_screenshot_1 = False
+            self.screenshot_1_data = None
+        self.diff_cache.clear()
+        self.update_history()
 
         self.tray.show_message("Detailist", "Screenshot cleared.")
 
-    def create_screenshot(self):
-        if self.is_screenshot_1 and self.is_screenshot_2:
+    def toggle_watch(self):
+        if self.watch is not None:
+            self.watch.stop()
+            self.watch = None
+            self.tray.show_message("Detailist", "Watch stopped.")
+            return
+
+        if not self.is_screenshot_1:
             self.tray.show_message(
-                "Detailist", "Clear one of the captured screenshots to take a new one."
+                "Detailist", "Take a screenshot of the area to watch first."
             )
             return
 
-        screenshot = ig.grab()
-        screenshot_data = BytesIO()
-        screenshot.save(screenshot_data, format="PNG")
+        self.watch = ScreenWatch(
+            self.screenshot_1_data,
+            self.screenshot_1_box,
+            self.watch_frame_rate,
+            self.comparison_strenght,
+            self.watch_min_changed_pixels,
+            self.add_watch_change,
+        )
+        self.tray.show_message(
+            "Detailist", "Watching the first screenshot area for changes."
+        )
+
+    def add_watch_change(self, screenshot_data, capture_box, diff_metrics):
+        # Runs in watch thread, changed screen is kept in history.
+        screenshot_id = self.history.add(screenshot_data, capture_box, time())
+        self.window.write_event_value(
+            self.watch_key,
+            {"screenshot_id": screenshot_id, "diff_metrics": diff_metrics},
+        )
+
+    def show_watch_change(self, watch_change):
+        if self.watch is None:
+            return
+
+        self.update_history()
+        diff_metrics = watch_change["diff_metrics"]
+        self.tray.show_message(
+            "Detailist",
+            f"Screen changed: {diff_metrics['regions']} regions"
+            f", {diff_metrics['changed_ratio']:.2%} of pixels."
+            f" Saved to history as {watch_change['screenshot_id']}.",
+        )
+
+    def get_capture_box(self, capture_mode):
+        # Monitor and window are known only on Windows, whole screen is
+        # captured elsewhere.
+        if capture_mode == "Monitor":
+            return get_cursor_monitor_box()
+        if capture_mode == "Window":
+            return get_active_window_box()
+        if capture_mode == "Rectangle":
+            return self.capture_box
+
+        return None
+
+    def create_screenshot(self, capture_mode="Screen"):
+        # Runs in keyboard thread, only grabs the screen and returns.
+        capture_box = self.get_capture_box(capture_mode)
+        if capture_mode == "Rectangle" and capture_box is None:
+            self.tray.show_message(
+                "Detailist", "Capture a monitor or window first to remember its area."
+            )
+            return
+        if capture_box is not None:
+            self.capture_box = capture_box
+
+        capture_time = time()
+        with self.profiler.operation("capture"):
+            with self.profiler.stage("grab"):
+                frame = grab_frame(capture_box)
+        self.capture_worker.submit(
+            {"frame": frame, "capture_box": capture_box, "capture_time": capture_time}
+        )
+
+    def get_capture(self, capture):
+        # Runs in capture worker thread, history compresses older
+        # screenshots here too.
+        with self.profiler.operation("convert_capture"):
+            with self.profiler.stage("convert"):
+                screenshot_data = get_frame_data(capture["frame"])
+            with self.profiler.stage("history"):
+                screenshot_id = self.history.add(
+                    screenshot_data, capture["capture_box"], capture["capture_time"]
+                )
+        return {
+            "screenshot_id": screenshot_id,
+            "screenshot_data": screenshot_data,
+            "capture_box": capture["capture_box"],
+            "capture_time": capture["capture_time"],
+        }
+
+    def add_screenshot(self, capture):
+        self.build_window(self.diff_window_key)
+        if self.is_screenshot_1 and self.is_screenshot_2:
+            self.update_history()
+            self.tray.show_message(
+                "Detailist",
+                "Screenshot saved to history. Clear one of the captured screenshots"
+                " or select it from history to compare.",
+            )
+            return
 
         graph = self.graph_2 if self.is_screenshot_1 else self.graph_1
-        graph.erase()
-        graph.draw_image(data=screenshot_data.getvalue(), location=(0, 0))
+        self.set_screenshot(graph, capture)
         self.tray.show_message("Detailist", "Screenshot captured.")
 
-        if self.is_screenshot_1:
-            self.is_screenshot_2 = True
-        else:
-            self.is_screenshot_1 = True
-
         if self.is_screenshot_2 and self.is_screenshot_1:
             if self.visible_window != self.diff_window_key:
                 self.open_window(self.diff_window_key)
+            self.calculate_screenshots_diff()
 
-            # Wait 50 msec for window.bring_to_front.
-            Timer(0.05, self.calculate_screenshots_diff).start()
-
-    def get_element_image(self, element):
-        self.window.bring_to_front()
-        widget = element.Widget
-        bbox = (
-            widget.winfo_rootx(),
-            widget.winfo_rooty(),
-            widget.winfo_rootx() + widget.winfo_width(),
-            widget.winfo_rooty() + widget.winfo_height(),
+    def set_screenshot(self, graph, capture):
+        if graph == self.graph_1:
+            self.is_screenshot_1 = True
+            self.screenshot_1_data = capture["screenshot_data"]
+            self.screenshot_1_id = capture["screenshot_id"]
+            self.screenshot_1_box = capture["capture_box"]
+            self.screenshot_1_time = capture["capture_time"]
+        elif graph == self.graph_2:
+            self.is_screenshot_2 = True
+            self.screenshot_2_data = capture["screenshot_data"]
+            self.screenshot_2_id = capture["screenshot_id"]
+            self.screenshot_2_box = capture["capture_box"]
+            self.screenshot_2_time = capture["capture_time"]
+        with self.profiler.operation("show_screenshot"):
+            with self.profiler.stage("tiles"):
+                self.erase_graph(graph)
+                self.graph_tiles[graph.key].set_image(capture["screenshot_data"])
+            with self.profiler.stage("history"):
+                self.update_history()
+
+    def get_history_label(self, entry):
+        heigh, width = entry["shape"][:2]
+        return (
+            f"{entry['id']}. {strftime('%H:%M:%S', localtime(entry['capture_time']))}"
+            f" {width}x{heigh}"
         )
 
-        return ig.grab(bbox=bbox)
+    def update_history(self):
+        history_labels = {
+            entry["id"]: self.get_history_label(entry)
+            for entry in reversed(self.history.get_entries())
+        }
+        for history_key, is_screenshot, screenshot_id in (
+            (self.history_1_key, self.is_screenshot_1, self.screenshot_1_id),
+            (self.history_2_key, self.is_screenshot_2, self.screenshot_2_id),
+        ):
+            self.window[history_key].update(
+                value=history_labels.get(screenshot_id, "") if is_screenshot else "",
+                values=list(history_labels.values()),
+            )
 
-    def translation(self, value, input_min, input_max, output_min, output_max):
-        input_range = input_max - input_min
-        output_range = output_max - output_min
+    def open_history_screenshot(self, event, history_label):
+        if not history_label:
+            return
 
-        normalized_value = float(value - input_min) / float(input_range)
-        return output_min + (normalized_value * output_range)
+        screenshot_id = int(history_label.split(".")[0])
+        # Entry may be removed from history before it is selected.
+        entry = next(
+            (
+                entry
+                for entry in self.history.get_entries()
+                if entry["id"] == screenshot_id
+            ),
+            None,
+        )
+        screenshot_data = None if entry is None else self.history.get(screenshot_id)
+        if screenshot_data is None:
+            self.tray.show_message("Detailist", "Screenshot is no longer in history.")
+            self.update_history()
+            return
 
-    def calculate_opacity_diff(self, image_1, image_2):
-        translated_strenght = self.translation(self.comparison_strenght, 1, 100, 0, 1)
+        graph = self.graph_1 if event == self.history_1_key else self.graph_2
+        self.set_screenshot(
+            graph,
+            {
+                "screenshot_id": screenshot_id,
+                "screenshot_data": screenshot_data,
+                "capture_box": entry["capture_box"],
+                "capture_time": entry["capture_time"],
+            },
+        )
+        self.calculate_screenshots_diff()
+
+    def get_viewport(self, graph):
+        # Visible canvas area in screenshot coordinates, without canvas border.
+        canvas = graph.tk_canvas
+        inset = int(canvas.cget("highlightthickness")) + int(canvas.cget("borderwidth"))
+        x_offset = int(round(canvas.canvasx(inset)))
+        y_offset = int(round(canvas.canvasy(inset)))
+        width = max(canvas.winfo_width() - 2 * inset, 1)
+        heigh = max(canvas.winfo_height() - 2 * inset, 1)
+
+        return x_offset, y_offset, width, heigh
+
+    def get_viewport_data(self, screenshot_data, viewport):
+        x_offset, y_offset, width, heigh = viewport
+        data_heigh, data_width = screenshot_data.shape[:2]
+        if (
+            x_offset >= 0
+            and y_offset >= 0
+            and x_offset + width <= data_width
+            and y_offset + heigh <= data_heigh
+        ):
+            return screenshot_data[
+                y_offset : y_offset + heigh, x_offset : x_offset + width
+            ]
 
-        return img.blend(image_1, image_2, translated_strenght)
+        # Viewport is partially outside of screenshot, pad it with black.
+        viewport_data = np.zeros((heigh, width, 3), dtype=np.uint8)
+        left = max(x_offset, 0)
+        top = max(y_offset, 0)
+        right = min(x_offset + width, data_width)
+        bottom = min(y_offset + heigh, data_heigh)
+        if left < right and top < bottom:
+            viewport_data[
+                top - y_offset : bottom - y_offset, left - x_offset : right - x_offset
+            ] = screenshot_data[top:bottom, left:right]
+
+        return viewport_data
+
+    def get_viewport_image(self, graph):
+        if graph == self.graph_1:
+            screenshot_data = self.screenshot_1_data
+        elif graph == self.graph_2:
+            screenshot_data = self.screenshot_2_data
+        if screenshot_data is None:
+            return None
+
+        viewport_data = self.get_viewport_data(screenshot_data, self.get_viewport(graph))
+        return img.fromarray(viewport_data, "RGB")
+
+    def calculate_opacity_diff(
+        self, img_data_1, img_data_2, comparison_strenght, alignment_key
+    ):
+        # Images are cached, strenght change only blends them again.
+        if alignment_key != self.opacity_key:
+            self.opacity_images = (
+                img.fromarray(img_data_1, "RGB"),
+                img.fromarray(img_data_2, "RGB"),
+            )
+            self.opacity_key = alignment_key
+
+        translated_strenght = translation(comparison_strenght, 1, 100, 0, 1)
+        return img.blend(*self.opacity_images, translated_strenght)
+
+    def calculate_heatmap_diff(
+        self,
+        img_data_1,
+        img_data_2,
+        comparison_mode,
+        comparison_strenght,
+        alignment_key,
+        is_boxes,
+    ):
+        # SSIM keeps its own magnitude, switching modes does not recalculate.
+        heatmap_diff = self.heatmap_diff
+        if comparison_mode == "SSIM":
+            heatmap_diff = self.ssim_diff
+        with self.profiler.stage(comparison_mode.lower()):
+            heatmap_data = heatmap_diff.calculate(
+                img_data_1, img_data_2, comparison_strenght, alignment_key
+            )
+        with self.profiler.stage("metrics"):
+            # Regions are labeled and shown only with boxes.
+            diff_metrics = get_diff_metrics(
+                heatmap_diff.magnitude, heatmap_data[:, :, 0] > 0, is_boxes
+            )
+        if is_boxes:
+            with self.profiler.stage("boxes"):
+                # Heatmap buffer is reused by the next calculation.
+                heatmap_data = heatmap_data.copy()
+                draw_region_boxes(heatmap_data, diff_metrics["boxes"])
+
+        with self.profiler.stage("image"):
+            return img.fromarray(heatmap_data, "RGB"), diff_metrics
+
+    def calculate_diff(
+        self,
+        img_data_1,
+        img_data_2,
+        comparison_mode,
+        comparison_strenght,
+        alignment_key,
+        is_boxes=False,
+    ):
+        # Returns difference image and metrics, metrics are calculated only
+        # for Heatmap and SSIM.
+        diff_metrics = None
+        if comparison_mode == "Opacity":
+            with self.profiler.stage("opacity"):
+                image_diff = self.calculate_opacity_diff(
+                    img_data_1, img_data_2, comparison_strenght, alignment_key
+                )
+        elif comparison_mode == "Simple Diff":
+            with self.profiler.stage("simple"):
+                image_diff = img.fromarray(
+                    calculate_simple_diff(img_data_1, img_data_2), "RGB"
+                )
+        else:
+            image_diff, diff_metrics = self.calculate_heatmap_diff(
+                img_data_1,
+                img_data_2,
+                comparison_mode,
+                comparison_strenght,
+                alignment_key,
+                is_boxes,
+            )
 
-    def calculate_heatmap_diff(self, image_1, image_2):
-        image_diff = ic.difference(image_1, image_2)
+        return image_diff, diff_metrics
 
-        image_data = np.array(image_diff.convert("HSV"))
-        image_data[:, :, 0] = 0
-        image_data[:, :, 1] = 255
-        _, _, value = image_data.T
+    def calculate_screenshots_diff(self):
+        if not self.is_screenshot_1 or not self.is_screenshot_2:
+            return
 
-        translated_strenght = self.translation(self.comparison_strenght, 1, 100, 0, 255)
-        strenght_mask = value < int(translated_strenght)
-        image_data[strenght_mask.T] = (0, 0, 0)
+        # Canvas state is read in GUI thread, the difference is calculated in
+        # diff worker thread. Only the latest request is calculated.
+        self.diff_request_count += 1
+        with self.profiler.operation("request_diff"):
+            with self.profiler.stage("viewport"):
+                diff_request = {
+                    "request_id": self.diff_request_count,
+                    "screenshot_1_data": self.screenshot_1_data,
+                    "screenshot_1_id": self.screenshot_1_id,
+                    "viewport_1": self.get_viewport(self.graph_1),
+                    "screenshot_2_data": self.screenshot_2_data,
+                    "screenshot_2_id": self.screenshot_2_id,
+                    "viewport_2": self.get_viewport(self.graph_2),
+                    "comparison_mode": self.comparison_mode,
+                    "comparison_strenght": self.comparison_strenght,
+                    "is_region_boxes": self.is_region_boxes,
+                }
+            with self.profiler.stage("cache"):
+                diff_value = self.diff_cache.get(self.get_diff_key(diff_request))
+        if diff_value is not None:
+            self.draw_screenshots_diff((diff_request["request_id"], diff_value))
+            return
 
-        return img.fromarray(image_data, "HSV").convert("RGB")
+        self.diff_worker.submit(diff_request)
 
-    def calculate_diff(self, image_1, image_2):
-        if self.comparison_mode == "Opacity":
-            image_diff = self.calculate_opacity_diff(image_1, image_2)
-        elif self.comparison_mode == "Simple Diff":
-            image_diff = self.calculate_simple_diff(image_1, image_2)
-        else:
-            image_diff = self.calculate_heatmap_diff(image_1, image_2)
+    def get_alignment_key(self, diff_request):
+        # Same screenshots at the same positions have the same difference,
+        # heatmap is updated only where the changed side differs.
+        return (
+            (diff_request["screenshot_1_id"], diff_request["viewport_1"]),
+            (diff_request["screenshot_2_id"], diff_request["viewport_2"]),
+        )
 
-        return image_diff
+    def get_diff_key(self, diff_request):
+        comparison_strenght = diff_request["comparison_strenght"]
+        if diff_request["comparison_mode"] == "Simple Diff":
+            comparison_strenght = None
+        is_region_boxes = diff_request["is_region_boxes"]
+        if diff_request["comparison_mode"] not in ("Heatmap", "SSIM"):
+            is_region_boxes = None
+
+        return (
+            self.get_alignment_key(diff_request),
+            diff_request["comparison_mode"],
+            comparison_strenght,
+            is_region_boxes,
+        )
 
-    def calculate_simple_diff(self, image_1, image_2):
-        return ic.difference(image_1, image_2)
+    def get_diff_size(self, diff_value):
+        screenshot_diff, _ = diff_value
+        return screenshot_diff.width * screenshot_diff.height * 3
 
-    def calculate_screenshots_diff(self):
+    def get_screenshots_diff(self, diff_request):
+        with self.profiler.operation("diff"):
+            with self.profiler.stage("viewport"):
+                img_data_1 = self.get_viewport_data(
+                    diff_request["screenshot_1_data"], diff_request["viewport_1"]
+                )
+                img_data_2 = self.get_viewport_data(
+                    diff_request["screenshot_2_data"], diff_request["viewport_2"]
+                )
+            diff_value = self.calculate_diff(
+                img_data_1,
+                img_data_2,
+                diff_request["comparison_mode"],
+                diff_request["comparison_strenght"],
+                self.get_alignment_key(diff_request),
+                diff_request["is_region_boxes"],
+            )
+
+        self.diff_cache.put(self.get_diff_key(diff_request), diff_value)
+        return diff_request["request_id"], diff_value
+
+    def draw_screenshots_diff(self, diff_result):
         if not self.is_screenshot_1 or not self.is_screenshot_2:
             return
-        if self.is_diff_in_progress:
+
+        # Worker result may arrive after a newer result was drawn from cache.
+        request_id, (screenshot_diff, diff_metrics) = diff_result
+        if request_id < self.diff_drawn_id:
             return
-        self.is_diff_in_progress = True
+        self.diff_drawn_id = request_id
+
+        self.screenshot_diff = screenshot_diff
+        with self.profiler.operation("draw_diff"):
+            with self.profiler.stage("photo"):
+                self.draw_graph_image(self.graph_diff, screenshot_diff)
+
+        metrics_text = ""
+        if diff_metrics is not None:
+            metrics_text = (
+                f"Changed: {diff_metrics['changed_ratio']:.2%}"
+                f", max delta: {diff_metrics['max_delta']}"
+            )
+            if diff_metrics["regions"] is not None:
+                metrics_text = f"Regions: {diff_metrics['regions']}, " + metrics_text
+        self.window[self.diff_metrics_key].update(metrics_text)
 
-        screenshot_1 = self.get_element_image(self.graph_1)
-        screenshot_2 = self.get_element_image(self.graph_2)
-        screenshot_diff = self.calculate_diff(screenshot_1, screenshot_2)
+    def erase_graph(self, graph):
+        graph.erase()
+        self.graph_photos.pop(graph.key, None)
+        if graph.key in self.graph_tiles:
+            self.graph_tiles[graph.key].clear()
+
+    def draw_graph_image(self, graph, image):
+        # Raw pixels are copied into Tk photo, without PNG encoding and decoding.
+        # Photo of the same size is updated in place.
+        graph_photo = self.graph_photos.get(graph.key)
+        if graph_photo is not None:
+            if (graph_photo.width(), graph_photo.height()) == image.size:
+                graph_photo.paste(image)
+                return
 
-        screenshot_data = BytesIO()
-        screenshot_diff.save(screenshot_data, format="PNG")
+        from PIL import ImageTk as itk
 
-        self.graph_diff.erase()
-        self.graph_diff.draw_image(data=screenshot_data.getvalue(), location=(0, 0))
-        self.is_diff_in_progress = False
+        self.erase_graph(graph)
+        graph_photo = itk.PhotoImage(image)
+        graph.tk_canvas.create_image(0, 0, image=graph_photo, anchor="nw")
+        # Tk photo is deleted when there are no Python references to it.
+        self.graph_photos[graph.key] = graph_photo
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares screenshot pairs without GUI.
+# Run: python detailist_batch.py LEFT_DIR RIGHT_DIR -o OUTPUT_DIR
+#      python detailist_batch.py --manifest pairs.csv -o OUTPUT_DIR
+
+import csv
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, makedirs, path, walk
+
+import numpy as np
+from PIL import Image as img
+
+from detailist_core import (
+    COMPARISON_MODES,
+    HeatmapDiff,
+    SsimDiff,
+    calculate_diff,
+    draw_region_boxes,
+    get_diff_metrics,
+    get_different_tiles,
+    get_image_shift,
+    get_perceptual_tiles,
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+SUMMARY_FIELDS = [
+    "name",
+    "left",
+    "right",
+    "output",
+    "width",
+    "heigh",
+    "changed_pixels",
+    "changed_ratio",
+    "max_delta",
+    "regions",
+    "boxes",
+    "changed_tiles",
+    "perceptual_changed_tiles",
+    "offset_x",
+    "offset_y",
+    "align_confidence",
+    "error",
+]
+
+
+def get_arguments(args=None):
+    parser = ArgumentParser(
+        description="Compare screenshot pairs and save heatmaps with a summary."
+    )
+    parser.add_argument("left", nargs="?", help="Directory with left screenshots.")
+    parser.add_argument(
+        "right", nargs="?", help="Directory with right screenshots of the same names."
+    )
+    parser.add_argument(
+        "--manifest",
+        help="CSV file with left,right[,name] rows or JSON list of such objects.",
+    )
+    parser.add_argument("-o", "--output", required=True, help="Output directory.")
+    parser.add_argument("--mode", choices=COMPARISON_MODES, default="Heatmap")
+    parser.add_argument(
+        "--strenght", type=int, default=20, help="Comparison strenght, 1-100."
+    )
+    parser.add_argument(
+        "--align",
+        action="store_true",
+        help="Align right screenshot to the left one before comparison.",
+    )
+    parser.add_argument(
+        "--boxes",
+        action="store_true",
+        help="Draw boxes around changed regions on saved differences.",
+    )
+    parser.add_argument(
+        "--perceptual",
+        action="store_true",
+        help="Calculate heatmap only in tiles which look different by average hash,"
+        " small changes inside a tile may be missed.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=cpu_count(), help="Number of processes."
+    )
+    parser.add_argument(
+        "--fail-ratio",
+        type=float,
+        help="Exit with code 1 if changed pixels ratio of any pair is above it.",
+    )
+    parser.add_argument(
+        "--max-regions",
+        type=int,
+        help="Exit with code 1 if any pair has more changed regions.",
+    )
+
+    arguments = parser.parse_args(args)
+    if not arguments.manifest and not (arguments.left and arguments.right):
+        parser.error("LEFT and RIGHT directories or --manifest are required.")
+    if not 1 <= arguments.strenght <= 100:
+        parser.error("--strenght must be from 1 to 100.")
+
+    return arguments
+
+
+def get_directory_pairs(left_path, right_path):
+    pairs = []
+    for directory_path, _, file_names in walk(left_path):
+        for file_name in sorted(file_names):
+            if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+
+            left_file = path.join(directory_path, file_name)
+            name = path.relpath(left_file, left_path)
+            pairs.append((name, left_file, path.join(right_path, name)))
+
+    return sorted(pairs)
+
+
+def get_manifest_pairs(manifest_path):
+    manifest_directory = path.dirname(path.abspath(manifest_path))
+    with open(manifest_path, encoding="utf8") as manifest_file:
+        if manifest_path.lower().endswith(".json"):
+            rows = json.load(manifest_file)
+        else:
+            rows = [row for row in csv.reader(manifest_file) if row]
+            if rows and [cell.strip().lower() for cell in rows[0][:2]] == [
+                "left",
+                "right",
+            ]:
+                rows = rows[1:]
+
+    pairs = []
+    for index, row in enumerate(rows):
+        if isinstance(row, dict):
+            left_file, right_file, name = row["left"], row["right"], row.get("name")
+        else:
+            left_file, right_file = row[0].strip(), row[1].strip()
+            name = row[2].strip() if len(row) > 2 else None
+
+        if not name:
+            name = f"{index:05d}_{path.basename(left_file)}"
+        pairs.append(
+            (
+                name,
+                path.join(manifest_directory, left_file),
+                path.join(manifest_directory, right_file),
+            )
+        )
+
+    return pairs
+
+
+def get_aligned_data(img_data_1, img_data_2, is_align):
+    # Returns overlapping parts of both images and the right image offset.
+    shift_x = shift_y = 0
+    confidence = None
+    if is_align:
+        image_shift = get_image_shift(img_data_1, img_data_2)
+        if image_shift is not None:
+            shift_x = int(round(image_shift[0]))
+            shift_y = int(round(image_shift[1]))
+            confidence = image_shift[2]
+
+    left = max(0, -shift_x)
+    top = max(0, -shift_y)
+    right = min(img_data_1.shape[1], img_data_2.shape[1] - shift_x)
+    bottom = min(img_data_1.shape[0], img_data_2.shape[0] - shift_y)
+
+    return (
+        img_data_1[top:bottom, left:right],
+        img_data_2[top + shift_y : bottom + shift_y, left + shift_x : right + shift_x],
+        shift_x,
+        shift_y,
+        confidence,
+    )
+
+
+def compare_pair(
+    pair,
+    output_path,
+    comparison_mode,
+    comparison_strenght,
+    is_align,
+    is_boxes,
+    is_perceptual,
+):
+    name, left_file, right_file = pair
+    summary = dict.fromkeys(SUMMARY_FIELDS, "")
+    summary.update(name=name, left=left_file, right=right_file)
+    try:
+        with img.open(left_file) as image_1, img.open(right_file) as image_2:
+            img_data_1 = np.asarray(image_1.convert("RGB"))
+            img_data_2 = np.asarray(image_2.convert("RGB"))
+
+        (
+            img_data_1,
+            img_data_2,
+            summary["offset_x"],
+            summary["offset_y"],
+            summary["align_confidence"],
+        ) = get_aligned_data(img_data_1, img_data_2, is_align)
+        if img_data_1.size == 0:
+            raise ValueError("Screenshots do not overlap.")
+
+        summary.update(width=img_data_1.shape[1], heigh=img_data_1.shape[0])
+        if np.array_equal(img_data_1, img_data_2):
+            # Identical screenshots are not rendered and saved.
+            summary.update(
+                changed_pixels=0,
+                changed_ratio=0.0,
+                max_delta=0,
+                regions=0,
+                boxes=[],
+                changed_tiles=0,
+                perceptual_changed_tiles=0,
+            )
+            return summary
+
+        # Heatmap magnitude gives the numbers for every comparison mode but
+        # SSIM, it is calculated only in tiles which differ.
+        tiles = get_different_tiles(img_data_1, img_data_2)
+        perceptual_tiles = get_perceptual_tiles(img_data_1, img_data_2, tiles)
+        summary.update(
+            changed_tiles=int(tiles.sum()),
+            perceptual_changed_tiles=int(perceptual_tiles.sum()),
+        )
+        heatmap_diff = SsimDiff() if comparison_mode == "SSIM" else HeatmapDiff()
+        heatmap_data = heatmap_diff.calculate(
+            img_data_1,
+            img_data_2,
+            comparison_strenght,
+            tiles=perceptual_tiles if is_perceptual else tiles,
+        )
+        diff_metrics = get_diff_metrics(
+            heatmap_diff.magnitude, heatmap_data[:, :, 0] > 0
+        )
+        summary.update(diff_metrics)
+
+        if comparison_mode not in ("Heatmap", "SSIM"):
+            heatmap_data = calculate_diff(
+                img_data_1, img_data_2, comparison_mode, comparison_strenght
+            )
+        if is_boxes:
+            heatmap_data = heatmap_data.copy()
+            draw_region_boxes(heatmap_data, diff_metrics["boxes"])
+        output_file = path.join(output_path, path.splitext(name)[0] + ".png")
+        makedirs(path.dirname(output_file), exist_ok=True)
+        img.fromarray(heatmap_data, "RGB").save(output_file, format="PNG")
+        summary["output"] = output_file
+    except (OSError, ValueError) as error:
+        summary["error"] = str(error)
+
+    return summary
+
+
+def save_summary(summaries, output_path):
+    with open(
+        path.join(output_path, "summary.json"), "w", encoding="utf8"
+    ) as summary_file:
+        json.dump(summaries, summary_file, indent=2)
+
+    with open(
+        path.join(output_path, "summary.csv"), "w", encoding="utf8", newline=""
+    ) as summary_file:
+        writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+
+
+def main(args=None):
+    arguments = get_arguments(args)
+    if arguments.manifest:
+        pairs = get_manifest_pairs(arguments.manifest)
+    else:
+        pairs = get_directory_pairs(arguments.left, arguments.right)
+    makedirs(arguments.output, exist_ok=True)
+
+    workers = max(1, min(arguments.workers or 1, len(pairs) or 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = list(
+            executor.map(
+                compare_pair,
+                pairs,
+                [arguments.output] * len(pairs),
+                [arguments.mode] * len(pairs),
+                [arguments.strenght] * len(pairs),
+                [arguments.align] * len(pairs),
+                [arguments.boxes] * len(pairs),
+                [arguments.perceptual] * len(pairs),
+                chunksize=max(1, len(pairs) // (workers * 4)),
+            )
+        )
+    save_summary(summaries, arguments.output)
+
+    errors = [summary for summary in summaries if summary["error"]]
+    changed = [summary for summary in summaries if summary["changed_pixels"]]
+    print(
+        f"Compared {len(summaries)} pairs: {len(changed)} changed, {len(errors)} errors."
+    )
+
+    if errors:
+        return 1
+    if arguments.fail_ratio is not None and any(
+        summary["changed_ratio"] > arguments.fail_ratio for summary in changed
+    ):
+        return 1
+    if arguments.max_regions is not None and any(
+        summary["regions"] > arguments.max_regions for summary in changed
+    ):
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from PIL import Image as img
+
+CANVAS_TILE_SIZE = 256
+
+
+class CanvasTiles:
+    # Shows a large image on Tk canvas by uploading only the tiles visible in
+    # the canvas view. Tiles far from the view are deleted, so Tk keeps only
+    # a few tiles instead of the full resolution image.
+    def __init__(self, canvas, tile_size=CANVAS_TILE_SIZE):
+        self.canvas = canvas
+        self.tile_size = tile_size
+        self.img_data = None
+        self.tiles = {}
+        self.is_update_pending = False
+
+        # Tk calls scroll commands on every view change: drag, scroll,
+        # moveto and resize.
+        canvas.configure(
+            xscrollcommand=self.schedule_update, yscrollcommand=self.schedule_update
+        )
+
+    def set_image(self, img_data):
+        self.clear()
+        self.img_data = img_data
+        self.update()
+
+    def clear(self):
+        for item, _ in self.tiles.values():
+            self.canvas.delete(item)
+        self.tiles = {}
+        self.img_data = None
+
+    def schedule_update(self, *_):
+        if self.is_update_pending:
+            return
+        self.is_update_pending = True
+        self.canvas.after_idle(self.update)
+
+    def get_tiles_range(self, margin):
+        heigh, width = self.img_data.shape[:2]
+        left = int(self.canvas.canvasx(0)) - margin
+        top = int(self.canvas.canvasy(0)) - margin
+        right = left + self.canvas.winfo_width() + 2 * margin
+        bottom = top + self.canvas.winfo_height() + 2 * margin
+
+        return (
+            range(
+                max(left, 0) // self.tile_size,
+                (min(right, width) + self.tile_size - 1) // self.tile_size,
+            ),
+            range(
+                max(top, 0) // self.tile_size,
+                (min(bottom, heigh) + self.tile_size - 1) // self.tile_size,
+            ),
+        )
+
+    def update(self):
+        self.is_update_pending = False
+        if self.img_data is None:
+            return
+
+        # Tiles next to the view are kept for small moves back and forth.
+        kept_x, kept_y = self.get_tiles_range(self.tile_size)
+        for tile_x, tile_y in list(self.tiles):
+            if tile_x not in kept_x or tile_y not in kept_y:
+                item, _ = self.tiles.pop((tile_x, tile_y))
+                self.canvas.delete(item)
+
+        visible_x, visible_y = self.get_tiles_range(0)
+        for tile_y in visible_y:
+            for tile_x in visible_x:
+                if (tile_x, tile_y) not in self.tiles:
+                    self.tiles[(tile_x, tile_y)] = self.create_tile(tile_x, tile_y)
+
+    def create_tile(self, tile_x, tile_y):
+        left = tile_x * self.tile_size
+        top = tile_y * self.tile_size
+        tile_data = self.img_data[
+            top : top + self.tile_size, left : left + self.tile_size
+        ]
+
+        # ImageTk loads Tk, it's imported when the first tile is drawn.
+        from PIL import ImageTk as itk
+
+        tile_photo = itk.PhotoImage(img.fromarray(tile_data, "RGB"))
+        item = self.canvas.create_image(left, top, image=tile_photo, anchor="nw")
+        return item, tile_photo
@@ -0,0 +1,247 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import numpy as np
+from PIL import ImageGrab as ig
+
+# Boxes are (left, top, right, bottom) in virtual screen coordinates.
+# Windows boxes are copied from the screen with GDI, only the box pixels are
+# read. Elsewhere, and for the full screen, Pillow ImageGrab is used.
+
+
+class DpiAware:
+    # Screen coordinates are physical pixels on scaled Windows displays while
+    # the calling thread is DPI aware.
+    def __enter__(self):
+        import ctypes
+
+        self.user32 = ctypes.windll.user32
+        self.previous_context = None
+        try:
+            self.user32.SetThreadDpiAwarenessContext.restype = ctypes.c_void_p
+            self.user32.SetThreadDpiAwarenessContext.argtypes = [ctypes.c_void_p]
+            # DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2
+            self.previous_context = self.user32.SetThreadDpiAwarenessContext(-4)
+        except AttributeError:
+            pass
+
+        return self
+
+    def __exit__(self, *exception):
+        if self.previous_context:
+            self.user32.SetThreadDpiAwarenessContext(self.previous_context)
+
+
+def get_monitor_boxes():
+    if not sys.platform.startswith("win"):
+        return []
+
+    import ctypes
+    from ctypes import wintypes
+
+    monitor_boxes = []
+    monitor_enum_proc = ctypes.WINFUNCTYPE(
+        wintypes.BOOL,
+        wintypes.HMONITOR,
+        wintypes.HDC,
+        ctypes.POINTER(wintypes.RECT),
+        wintypes.LPARAM,
+    )
+
+    def add_monitor_box(monitor, dc, rect, data):  # pylint: disable=unused-argument
+        box = rect.contents
+        monitor_boxes.append((box.left, box.top, box.right, box.bottom))
+        return True
+
+    with DpiAware():
+        ctypes.windll.user32.EnumDisplayMonitors(
+            None, None, monitor_enum_proc(add_monitor_box), 0
+        )
+
+    return monitor_boxes
+
+
+def get_cursor_monitor_box():
+    # Monitor under mouse cursor, None if it is unknown.
+    if not sys.platform.startswith("win"):
+        return None
+
+    import ctypes
+    from ctypes import wintypes
+
+    cursor = wintypes.POINT()
+    with DpiAware():
+        ctypes.windll.user32.GetCursorPos(ctypes.byref(cursor))
+    for left, top, right, bottom in get_monitor_boxes():
+        if left <= cursor.x < right and top <= cursor.y < bottom:
+            return left, top, right, bottom
+
+    return None
+
+
+def get_active_window_box():
+    # Active window without invisible resize borders, None if it is unknown.
+    if not sys.platform.startswith("win"):
+        return None
+
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    user32.GetForegroundWindow.restype = wintypes.HWND
+    rect = wintypes.RECT()
+    with DpiAware():
+        window = user32.GetForegroundWindow()
+        if not window:
+            return None
+
+        dwmwa_extended_frame_bounds = 9
+        try:
+            is_failed = ctypes.windll.dwmapi.DwmGetWindowAttribute(
+                window,
+                dwmwa_extended_frame_bounds,
+                ctypes.byref(rect),
+                ctypes.sizeof(rect),
+            )
+        except OSError:
+            is_failed = True
+        if is_failed and not user32.GetWindowRect(window, ctypes.byref(rect)):
+            return None
+
+    if rect.right <= rect.left or rect.bottom <= rect.top:
+        return None
+
+    return rect.left, rect.top, rect.right, rect.bottom
+
+
+def grab_windows_box(box):
+    import ctypes
+    from ctypes import wintypes
+
+    class BitmapInfoHeader(ctypes.Structure):
+        _fields_ = [
+            ("biSize", wintypes.DWORD),
+            ("biWidth", wintypes.LONG),
+            ("biHeight", wintypes.LONG),
+            ("biPlanes", wintypes.WORD),
+            ("biBitCount", wintypes.WORD),
+            ("biCompression", wintypes.DWORD),
+            ("biSizeImage", wintypes.DWORD),
+            ("biXPelsPerMeter", wintypes.LONG),
+            ("biYPelsPerMeter", wintypes.LONG),
+            ("biClrUsed", wintypes.DWORD),
+            ("biClrImportant", wintypes.DWORD),
+        ]
+
+    user32 = ctypes.windll.user32
+    gdi32 = ctypes.windll.gdi32
+    user32.GetDC.restype = wintypes.HDC
+    user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+    gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+    gdi32.CreateCompatibleDC.restype = wintypes.HDC
+    gdi32.CreateCompatibleBitmap.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int]
+    gdi32.CreateCompatibleBitmap.restype = wintypes.HBITMAP
+    gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+    gdi32.SelectObject.restype = wintypes.HGDIOBJ
+    gdi32.BitBlt.argtypes = [wintypes.HDC] + [ctypes.c_int] * 4 + [
+        wintypes.HDC,
+        ctypes.c_int,
+        ctypes.c_int,
+        wintypes.DWORD,
+    ]
+    gdi32.GetDIBits.argtypes = [
+        wintypes.HDC,
+        wintypes.HBITMAP,
+        wintypes.UINT,
+        wintypes.UINT,
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        wintypes.UINT,
+    ]
+    gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+    gdi32.DeleteDC.argtypes = [wintypes.HDC]
+
+    left, top, right, bottom = box
+    width = right - left
+    heigh = bottom - top
+    # Top-down 32-bit BGRX rows.
+    bitmap_info = BitmapInfoHeader(
+        biSize=ctypes.sizeof(BitmapInfoHeader),
+        biWidth=width,
+        biHeight=-heigh,
+        biPlanes=1,
+        biBitCount=32,
+    )
+    bgrx_data = np.empty((heigh, width, 4), dtype=np.uint8)
+
+    srccopy = 0x00CC0020
+    captureblt = 0x40000000
+    with DpiAware():
+        screen_dc = user32.GetDC(None)
+        memory_dc = gdi32.CreateCompatibleDC(screen_dc)
+        bitmap = gdi32.CreateCompatibleBitmap(screen_dc, width, heigh)
+        try:
+            previous_bitmap = gdi32.SelectObject(memory_dc, bitmap)
+            is_copied = gdi32.BitBlt(
+                memory_dc,
+                0,
+                0,
+                width,
+                heigh,
+                screen_dc,
+                left,
+                top,
+                srccopy | captureblt,
+            )
+            gdi32.SelectObject(memory_dc, previous_bitmap)
+            if not is_copied or not gdi32.GetDIBits(
+                memory_dc,
+                bitmap,
+                0,
+                heigh,
+                bgrx_data.ctypes.data,
+                ctypes.byref(bitmap_info),
+                0,
+            ):
+                raise OSError("Screen capture failed.")
+        finally:
+            gdi32.DeleteObject(bitmap)
+            gdi32.DeleteDC(memory_dc)
+            user32.ReleaseDC(None, screen_dc)
+
+    return bgrx_data
+
+
+def grab_frame(box=None):
+    # Returns the captured pixels as they are, BGRX array or Pillow image,
+    # get_frame_data converts them later.
+    if box is not None and sys.platform.startswith("win"):
+        return grab_windows_box(box)
+
+    return ig.grab(bbox=box, all_screens=box is not None)
+
+
+def get_frame_data(frame):
+    # Returns RGB array of the frame from grab_frame.
+    if isinstance(frame, np.ndarray):
+        return np.ascontiguousarray(frame[:, :, 2::-1])
+
+    return np.asarray(frame.convert("RGB"))
+
+
+def grab_screen(box=None):
+    # Returns RGB array of the box, of the whole screen when box is None.
+    return get_frame_data(grab_frame(box))
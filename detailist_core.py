@@ -0,0 +1,1361 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import sys
+from collections import OrderedDict
+from hashlib import blake2b
+from io import BytesIO
+from itertools import count
+from math import ceil, sqrt
+from os import environ, listdir, path, remove
+from shutil import which
+from subprocess import DEVNULL, PIPE, STDOUT, Popen
+from threading import Lock
+
+import numpy as np
+from PIL import Image as img
+
+COMPARISON_MODES = ("Heatmap", "SSIM", "Opacity", "Simple Diff")
+OCR_MODES = ("Full", "Bands", "Changes")
+
+# Peak of normalized phase correlation is 1.0 for identical shifted images
+# and close to 1/sqrt(pixels) for unrelated images.
+MIN_SHIFT_CONFIDENCE = 0.05
+# Correlation is circular, shift d and d - size have the same peak. Both are
+# checked by normalized cross-correlation of the overlap, which must cover at
+# least this part of the images.
+MIN_SHIFT_OVERLAP = 0.25
+# Shifts up to this part of the viewport overlap enough to be trusted, larger
+# shifts are searched by template in the whole screenshot.
+MAX_NEAR_SHIFT = 0.25
+# Larger images are correlated downsampled and refined on a full resolution patch.
+MAX_PHASE_PIXELS = 1 << 19
+REFINE_PATCH_SIZE = 256
+# Template search starts on a downsampled image and refines the position at
+# every twice larger level within a few pixels.
+PYRAMID_MIN_TEMPLATE = 16
+PYRAMID_SEARCH_RADIUS = 4
+# Normalized cross-correlation of a matching template is close to 1.0.
+MIN_MATCH_SCORE = 0.5
+# Heatmap is updated in tiles which differ from the previous images and
+# calculated only in tiles which differ between the two images. When more
+# tiles changed, the whole heatmap is calculated in one pass.
+DIFF_TILE_SIZE = 64
+MAX_UPDATED_TILES_RATIO = 0.5
+# Tiles look the same when their 8x8 average hashes are within this distance.
+PERCEPTUAL_HASH_SIZE = 8
+PERCEPTUAL_HASH_DISTANCE = 2
+# Structural similarity is compared in square windows of gray pixels, the
+# constants keep it stable in flat areas of 8 bit images.
+SSIM_WINDOW_SIZE = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+# Watch mode compares sums of blocks of a downsampled gray frame first.
+WATCH_DOWNSAMPLE = 4
+WATCH_BLOCK_SIZE = 16
+# Text bands are split in the middle of blank row runs. A row is blank when
+# it does not differ from its neighbours more than OCR_INK_THRESHOLD.
+OCR_INK_THRESHOLD = 32
+OCR_BAND_GAP = 4
+OCR_BAND_MIN_HEIGH = 48
+# Changed pixels are grouped into regions of touching tiles, regions are
+# cropped with a margin so tesseract sees whole characters.
+OCR_REGION_TILE_SIZE = 16
+OCR_REGION_MARGIN = 8
+OCR_MAX_REGIONS = 32
+
+
+def translation(value, input_min, input_max, output_min, output_max):
+    input_range = input_max - input_min
+    output_range = output_max - output_min
+
+    normalized_value = float(value - input_min) / float(input_range)
+    return output_min + (normalized_value * output_range)
+
+
+def get_strenght_threshold(comparison_strenght):
+    return int(translation(comparison_strenght, 1, 100, 0, 255))
+
+
+def get_tile_strips(tiles, tile_size, heigh, width):
+    # Runs of neighbouring marked tiles in every row of tiles, as pixel slices.
+    for tile_y, tiles_row in enumerate(tiles):
+        edges = np.flatnonzero(np.diff(tiles_row, prepend=False, append=False))
+        for tile_left, tile_right in zip(edges[::2], edges[1::2]):
+            yield (
+                slice(tile_y * tile_size, min((tile_y + 1) * tile_size, heigh)),
+                slice(tile_left * tile_size, min(tile_right * tile_size, width)),
+            )
+
+
+def get_different_tiles(img_data_1, img_data_2, changes=None):
+    # Tiles which are not byte identical. changes is an optional buffer of
+    # whole tiles size, its padding must stay False.
+    heigh, width = img_data_1.shape[:2]
+    tiles_shape = (ceil(heigh / DIFF_TILE_SIZE), ceil(width / DIFF_TILE_SIZE))
+    if changes is None:
+        changes = np.zeros(
+            (tiles_shape[0] * DIFF_TILE_SIZE, tiles_shape[1] * DIFF_TILE_SIZE * 3),
+            dtype=bool,
+        )
+    np.not_equal(
+        img_data_1.reshape(heigh, width * 3),
+        img_data_2.reshape(heigh, width * 3),
+        out=changes[:heigh, : width * 3],
+    )
+
+    return changes.reshape(
+        tiles_shape[0], DIFF_TILE_SIZE, tiles_shape[1], DIFF_TILE_SIZE * 3
+    ).any(axis=(1, 3))
+
+
+def get_perceptual_hashes(img_data):
+    # Average hash of every tile: a bit per cell of 8x8 grid, set when the
+    # cell is brighter than the tile.
+    cell_size = DIFF_TILE_SIZE // PERCEPTUAL_HASH_SIZE
+    heigh, width = img_data.shape[:2]
+    tiles_shape = (ceil(heigh / DIFF_TILE_SIZE), ceil(width / DIFF_TILE_SIZE))
+    padded_data = np.zeros(
+        (tiles_shape[0] * DIFF_TILE_SIZE, tiles_shape[1] * DIFF_TILE_SIZE, 3),
+        dtype=np.uint8,
+    )
+    padded_data[:heigh, :width] = img_data
+
+    cells = get_downsampled_gray(padded_data, cell_size).reshape(
+        tiles_shape[0], PERCEPTUAL_HASH_SIZE, tiles_shape[1], PERCEPTUAL_HASH_SIZE
+    )
+    bits = cells > cells.mean(axis=(1, 3), keepdims=True)
+
+    return np.packbits(bits.transpose(0, 2, 1, 3).reshape(*tiles_shape, -1), axis=2)
+
+
+def get_perceptual_tiles(img_data_1, img_data_2, tiles=None):
+    # Tiles which look different, of the given tiles when they are set.
+    hash_distances = np.unpackbits(
+        get_perceptual_hashes(img_data_1) ^ get_perceptual_hashes(img_data_2), axis=2
+    ).sum(axis=2)
+    perceptual_tiles = hash_distances > PERCEPTUAL_HASH_DISTANCE
+    if tiles is not None:
+        perceptual_tiles &= tiles
+
+    return perceptual_tiles
+
+
+class HeatmapDiff:
+    # Red heatmap of the largest channel difference of every pixel, pixels
+    # below strenght threshold are black. Buffers are reused while the image
+    # size is the same, returned heatmap is valid until the next call.
+    #
+    # magnitude_key is a pair of keys of the two images. When only some keys
+    # change, only tiles which differ from the previous images are calculated
+    # again. changed_tiles marks heatmap tiles changed by the last call.
+    # Images of the same key are the same, so images are kept for the next
+    # call without copying and must not be changed.
+    #
+    # Without magnitude_key, magnitude is calculated only in tiles which are
+    # not byte identical, or only in the given tiles.
+    def __init__(self):
+        self.shape = None
+
+    def init_buffers(self, shape):
+        self.shape = shape
+        self.max_data = np.empty(shape, dtype=np.uint8)
+        self.min_data = np.empty(shape, dtype=np.uint8)
+        self.magnitude = np.empty(shape[:2], dtype=np.uint8)
+        self.mask = np.empty(shape[:2], dtype=bool)
+        # Green and blue channels are never written and stay zero.
+        self.heatmap = np.zeros(shape, dtype=np.uint8)
+
+        self.tiles_shape = (
+            ceil(shape[0] / DIFF_TILE_SIZE),
+            ceil(shape[1] / DIFF_TILE_SIZE),
+        )
+        self.changed_tiles = np.ones(self.tiles_shape, dtype=bool)
+        self.magnitude_key = None
+        self.strenght_threshold = None
+        self.previous_data = None
+        # Compared tiles buffer is allocated on first comparison.
+        self.changes = None
+
+    def calculate(
+        self,
+        img_data_1,
+        img_data_2,
+        comparison_strenght,
+        magnitude_key=None,
+        tiles=None,
+    ):
+        if img_data_1.shape != self.shape:
+            self.init_buffers(img_data_1.shape)
+
+        if magnitude_key is None:
+            self.calculate_tiles_magnitude(img_data_1, img_data_2, tiles)
+            self.changed_tiles.fill(True)
+        elif magnitude_key != self.magnitude_key:
+            self.update_magnitude(img_data_1, img_data_2, magnitude_key)
+        else:
+            # Same difference, strenght change only applies a new threshold.
+            self.changed_tiles.fill(False)
+        self.magnitude_key = magnitude_key
+
+        strenght_threshold = get_strenght_threshold(comparison_strenght)
+        if strenght_threshold != self.strenght_threshold:
+            self.strenght_threshold = strenght_threshold
+            self.changed_tiles.fill(True)
+
+        for region in get_tile_strips(
+            self.changed_tiles, DIFF_TILE_SIZE, *self.shape[:2]
+        ):
+            self.apply_threshold(region)
+
+        return self.heatmap
+
+    def get_changes(self):
+        if self.changes is None:
+            self.changes = np.zeros(
+                (
+                    self.tiles_shape[0] * DIFF_TILE_SIZE,
+                    self.tiles_shape[1] * DIFF_TILE_SIZE * 3,
+                ),
+                dtype=bool,
+            )
+
+        return self.changes
+
+    def get_magnitude_tiles(self, tiles):
+        # Tiles whose magnitude depends on pixels of the given tiles.
+        return tiles
+
+    def calculate_tiles_magnitude(self, img_data_1, img_data_2, tiles=None):
+        if tiles is None:
+            tiles = get_different_tiles(img_data_1, img_data_2, self.get_changes())
+        magnitude_tiles = self.get_magnitude_tiles(tiles)
+        if magnitude_tiles.all():
+            self.calculate_magnitude(img_data_1, img_data_2)
+            return
+
+        self.magnitude.fill(0)
+        for region in get_tile_strips(
+            magnitude_tiles, DIFF_TILE_SIZE, *self.shape[:2]
+        ):
+            self.calculate_magnitude(img_data_1, img_data_2, region)
+
+    def update_magnitude(self, img_data_1, img_data_2, magnitude_key):
+        previous_data = self.previous_data
+        self.previous_data = (img_data_1, img_data_2)
+        if self.magnitude_key is None:
+            self.calculate_tiles_magnitude(img_data_1, img_data_2)
+            self.changed_tiles.fill(True)
+            return
+
+        self.changed_tiles.fill(False)
+        for img_data, previous_img_data, key, previous_key in zip(
+            (img_data_1, img_data_2),
+            previous_data,
+            magnitude_key,
+            self.magnitude_key,
+        ):
+            if key != previous_key:
+                self.changed_tiles |= get_different_tiles(
+                    img_data, previous_img_data, self.get_changes()
+                )
+        self.changed_tiles = self.get_magnitude_tiles(self.changed_tiles)
+
+        # Moved screenshot changes most tiles, strips would be slower.
+        if self.changed_tiles.mean() > MAX_UPDATED_TILES_RATIO:
+            self.calculate_magnitude(img_data_1, img_data_2)
+            self.changed_tiles.fill(True)
+            return
+
+        for region in get_tile_strips(
+            self.changed_tiles, DIFF_TILE_SIZE, *self.shape[:2]
+        ):
+            self.calculate_magnitude(img_data_1, img_data_2, region)
+
+    def calculate_magnitude(self, img_data_1, img_data_2, region=(slice(None),) * 2):
+        img_data_1 = img_data_1[region]
+        img_data_2 = img_data_2[region]
+        max_data = self.max_data[region]
+        min_data = self.min_data[region]
+        magnitude = self.magnitude[region]
+
+        # |a - b| of unsigned bytes without wrap around or int16 copies.
+        np.maximum(img_data_1, img_data_2, out=max_data)
+        np.minimum(img_data_1, img_data_2, out=min_data)
+        np.subtract(max_data, min_data, out=max_data)
+
+        # Value of HSV is the largest channel.
+        np.maximum(max_data[:, :, 0], max_data[:, :, 1], out=magnitude)
+        np.maximum(magnitude, max_data[:, :, 2], out=magnitude)
+
+    def apply_threshold(self, region=(slice(None),) * 2):
+        magnitude = self.magnitude[region]
+        mask = self.mask[region]
+        np.greater_equal(magnitude, self.strenght_threshold, out=mask)
+        np.multiply(magnitude, mask, out=self.heatmap[region][:, :, 0])
+
+
+class SsimDiff(HeatmapDiff):
+    # Red heatmap of structural dissimilarity, SSIM of the window around
+    # every gray pixel. Anti-aliasing and subpixel font rendering keep the
+    # structure of text, so they stay below the threshold where the largest
+    # channel difference does not.
+    #
+    # Tiles are calculated as in HeatmapDiff, windows of pixels near a tile
+    # edge reach into neighbouring tiles, so those are calculated too.
+    def init_buffers(self, shape):
+        super().init_buffers(shape)
+        # Channel differences are not used.
+        self.max_data = self.min_data = None
+
+    def get_magnitude_tiles(self, tiles):
+        tiles_heigh, tiles_width = tiles.shape
+        padded_tiles = np.pad(tiles, 1)
+        magnitude_tiles = np.zeros_like(tiles)
+        for tile_y in range(3):
+            for tile_x in range(3):
+                magnitude_tiles |= padded_tiles[
+                    tile_y : tile_y + tiles_heigh, tile_x : tile_x + tiles_width
+                ]
+
+        return magnitude_tiles
+
+    def calculate_magnitude(self, img_data_1, img_data_2, region=(slice(None),) * 2):
+        # Calculated in strips of tile heigh, so window sums of the whole
+        # image are never kept in memory.
+        top, bottom, _ = region[0].indices(self.shape[0])
+        left, right, _ = region[1].indices(self.shape[1])
+        for strip_top in range(top, bottom, DIFF_TILE_SIZE):
+            strip_bottom = min(strip_top + DIFF_TILE_SIZE, bottom)
+            strip_box = (left, strip_top, right, strip_bottom)
+            dissimilarity = get_structural_similarity(
+                get_window_gray(img_data_1, strip_box),
+                get_window_gray(img_data_2, strip_box),
+            )
+            # SSIM from 1 to -1 is shown from black to full red.
+            np.subtract(1, dissimilarity, out=dissimilarity)
+            dissimilarity *= 255 / 2
+            np.clip(dissimilarity, 0, 255, out=dissimilarity)
+            self.magnitude[strip_top:strip_bottom, left:right] = dissimilarity
+
+
+def get_window_gray(img_data, box, window_size=SSIM_WINDOW_SIZE):
+    # 8 bit gray pixels of the box with a margin for windows around its
+    # pixels, image edge pixels are repeated outside of the image.
+    left, top, right, bottom = box
+    margin = window_size // 2
+    heigh, width = img_data.shape[:2]
+    margin_left = max(0, left - margin)
+    margin_top = max(0, top - margin)
+    margin_right = min(width, right + margin)
+    margin_bottom = min(heigh, bottom + margin)
+    gray_image = img.fromarray(
+        img_data[margin_top:margin_bottom, margin_left:margin_right], "RGB"
+    ).convert("L")
+
+    return np.pad(
+        np.asarray(gray_image),
+        (
+            (margin - (top - margin_top), margin - (margin_bottom - bottom)),
+            (margin - (left - margin_left), margin - (margin_right - right)),
+        ),
+        mode="edge",
+    )
+
+
+def get_structural_similarity(gray_1, gray_2, window_size=SSIM_WINDOW_SIZE):
+    # SSIM of every window fully inside both 8 bit gray images. Window sums
+    # come from box sums of integral images, the cost does not depend on
+    # window size. Sums, squares and products of 7x7 windows of bytes and
+    # their products below are exact in 32 bit integers, so variances of
+    # bright windows do not lose precision.
+    pixels = window_size * window_size
+    data = np.empty((4,) + gray_1.shape, dtype=np.uint32)
+    data[0] = gray_1
+    data[1] = gray_2
+    np.multiply(data[0], data[0], out=data[2])
+    np.multiply(data[1], data[1], out=data[3])
+    data[2] += data[3]
+    np.multiply(data[0], data[1], out=data[3])
+    sums_1, sums_2, squares, products = get_box_sums(
+        data, window_size, window_size, np.uint32
+    ).view(np.int32)
+
+    # SSIM of means, variances and covariance multiplied by pixels^2:
+    # (2 s1 s2 + c1) (2 (n p - s1 s2) + c2)
+    # / ((s1^2 + s2^2 + c1) (n q - s1^2 - s2^2 + c2))
+    sums_product = sums_1 * sums_2
+    products *= pixels
+    products -= sums_product
+    sums_squares = np.square(sums_1, out=sums_1)
+    sums_squares += np.square(sums_2, out=sums_2)
+    squares *= pixels
+    squares -= sums_squares
+
+    numerator = sums_product.astype(np.float32)
+    numerator *= 2
+    numerator += SSIM_C1 * pixels * pixels
+    covariances = products.astype(np.float32)
+    covariances *= 2
+    covariances += SSIM_C2 * pixels * pixels
+    numerator *= covariances
+
+    denominator = sums_squares.astype(np.float32)
+    denominator += SSIM_C1 * pixels * pixels
+    variances = squares.astype(np.float32)
+    variances += SSIM_C2 * pixels * pixels
+    denominator *= variances
+
+    numerator /= denominator
+    return numerator
+
+
+def calculate_opacity_diff(img_data_1, img_data_2, comparison_strenght):
+    translated_strenght = translation(comparison_strenght, 1, 100, 0, 1)
+
+    return np.asarray(
+        img.blend(
+            img.fromarray(img_data_1, "RGB"),
+            img.fromarray(img_data_2, "RGB"),
+            translated_strenght,
+        )
+    )
+
+
+def calculate_heatmap_diff(img_data_1, img_data_2, comparison_strenght):
+    return HeatmapDiff().calculate(img_data_1, img_data_2, comparison_strenght)
+
+
+def calculate_ssim_diff(img_data_1, img_data_2, comparison_strenght):
+    return SsimDiff().calculate(img_data_1, img_data_2, comparison_strenght)
+
+
+def calculate_simple_diff(img_data_1, img_data_2):
+    return np.maximum(img_data_1, img_data_2) - np.minimum(img_data_1, img_data_2)
+
+
+def calculate_diff(img_data_1, img_data_2, comparison_mode, comparison_strenght):
+    if comparison_mode == "Opacity":
+        return calculate_opacity_diff(img_data_1, img_data_2, comparison_strenght)
+    if comparison_mode == "Simple Diff":
+        return calculate_simple_diff(img_data_1, img_data_2)
+    if comparison_mode == "SSIM":
+        return calculate_ssim_diff(img_data_1, img_data_2, comparison_strenght)
+
+    return calculate_heatmap_diff(img_data_1, img_data_2, comparison_strenght)
+
+
+class LruCache:
+    # Least recently used values are evicted when the total size of values
+    # exceeds max_size. Safe to use from several threads.
+    def __init__(self, max_size, get_size=len):
+        self.max_size = max_size
+        self.get_size = get_size
+        self.values = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.values:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.values.move_to_end(key)
+            return self.values[key][0]
+
+    def put(self, key, value):
+        value_size = self.get_size(value)
+        with self.lock:
+            if key in self.values:
+                self.size -= self.values.pop(key)[1]
+            if value_size > self.max_size:
+                return
+
+            self.values[key] = (value, value_size)
+            self.size += value_size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self.values.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.size = 0
+
+    def get_items(self):
+        # Returns (key, value) pairs from least to most recently used.
+        with self.lock:
+            return [(key, value) for key, (value, _) in self.values.items()]
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "count": len(self.values),
+                "size": self.size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def get_mask_runs(mask):
+    # Returns rows, starts and ends of horizontal runs of True pixels,
+    # ordered by row and start.
+    heigh, width = mask.shape
+    padded_mask = np.zeros((heigh, width + 2), dtype=np.int8)
+    padded_mask[:, 1:-1] = mask
+    edges = np.diff(padded_mask, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    return rows, starts, ends
+
+
+def get_run_labels(rows, starts, ends, width):
+    # Runs in neighbouring rows are connected when they touch, diagonals
+    # included. Components are merged by hooking roots to the smaller root
+    # and pointer jumping, every step is a vectorized pass over all runs.
+    run_count = len(rows)
+    row_width = width + 2
+    start_keys = rows * row_width + starts
+    end_keys = rows * row_width + ends
+    previous_row_keys = (rows - 1) * row_width
+    first_runs = np.searchsorted(end_keys, previous_row_keys + starts, side="left")
+    last_runs = np.searchsorted(start_keys, previous_row_keys + ends, side="right")
+    link_counts = np.maximum(last_runs - first_runs, 0)
+
+    # Every run is linked to each touching run in the previous row.
+    runs_1 = np.repeat(np.arange(run_count), link_counts)
+    link_offsets = np.arange(len(runs_1)) - np.repeat(
+        np.cumsum(link_counts) - link_counts, link_counts
+    )
+    runs_2 = np.repeat(first_runs, link_counts) + link_offsets
+
+    labels = np.arange(run_count)
+    while True:
+        roots_1 = labels[runs_1]
+        roots_2 = labels[runs_2]
+        min_roots = np.minimum(roots_1, roots_2)
+        next_labels = labels.copy()
+        np.minimum.at(next_labels, roots_1, min_roots)
+        np.minimum.at(next_labels, roots_2, min_roots)
+        while True:
+            jumped_labels = next_labels[next_labels]
+            if np.array_equal(jumped_labels, next_labels):
+                break
+            next_labels = jumped_labels
+
+        if np.array_equal(next_labels, labels):
+            return labels
+        labels = next_labels
+
+
+def get_mask_regions(mask):
+    # Returns (left, top, right, bottom) boxes and pixel counts of
+    # 8-connected regions of True pixels.
+    rows, starts, ends = get_mask_runs(mask)
+    if len(rows) == 0:
+        return np.empty((0, 4), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    _, labels = np.unique(
+        get_run_labels(rows, starts, ends, mask.shape[1]), return_inverse=True
+    )
+    region_count = labels.max() + 1
+
+    boxes = np.empty((region_count, 4), dtype=np.int64)
+    boxes[:, :2] = np.iinfo(np.int64).max
+    boxes[:, 2:] = 0
+    np.minimum.at(boxes[:, 0], labels, starts)
+    np.minimum.at(boxes[:, 1], labels, rows)
+    np.maximum.at(boxes[:, 2], labels, ends)
+    np.maximum.at(boxes[:, 3], labels, rows + 1)
+    pixel_counts = np.bincount(labels, weights=ends - starts).astype(np.int64)
+
+    return boxes, pixel_counts
+
+
+def get_diff_metrics(magnitude, mask, is_regions=True):
+    # Regions and boxes are None without is_regions, labeling regions costs
+    # more than the heatmap itself.
+    changed_pixels = int(np.count_nonzero(mask))
+    regions = boxes = None
+    if is_regions:
+        region_boxes, _ = get_mask_regions(mask)
+        regions = len(region_boxes)
+        boxes = region_boxes.tolist()
+
+    return {
+        "regions": regions,
+        "boxes": boxes,
+        "changed_pixels": changed_pixels,
+        "changed_ratio": changed_pixels / mask.size if mask.size else 0.0,
+        "max_delta": int(magnitude.max()) if magnitude.size else 0,
+    }
+
+
+def draw_region_boxes(img_data, boxes, color=(0, 255, 0)):
+    # Draws one pixel box outlines in place.
+    for left, top, right, bottom in boxes:
+        img_data[top, left:right] = color
+        img_data[bottom - 1, left:right] = color
+        img_data[top:bottom, left] = color
+        img_data[top:bottom, right - 1] = color
+
+
+def get_data_hash(img_data):
+    img_data = np.ascontiguousarray(img_data)
+    data_hash = blake2b(str(img_data.shape).encode(), digest_size=16)
+    data_hash.update(img_data.data)
+
+    return data_hash.hexdigest()
+
+
+def get_gray_data(img_data):
+    if img_data.ndim == 2:
+        return img_data.astype(np.float32)
+
+    return img_data[:, :, :3] @ GRAY_WEIGHTS
+
+
+def get_downsampled_gray(img_data, factor):
+    # Box filter downsampling, reads every pixel once without full size copies.
+    if factor <= 1:
+        return get_gray_data(img_data)
+
+    heigh = img_data.shape[0] // factor * factor
+    width = img_data.shape[1] // factor * factor
+    rows_sum = img_data[0:heigh:factor, :width].astype(np.float32)
+    for row in range(1, factor):
+        rows_sum += img_data[row:heigh:factor, :width]
+
+    rows_gray = get_gray_data(rows_sum)
+    gray_data = rows_gray[:, 0::factor].copy()
+    for column in range(1, factor):
+        gray_data += rows_gray[:, column::factor]
+
+    gray_data /= factor * factor
+    return gray_data
+
+
+def get_block_fingerprints(
+    img_data, factor=WATCH_DOWNSAMPLE, block_size=WATCH_BLOCK_SIZE
+):
+    # Plain and position weighted sums of every block of downsampled gray
+    # image, so content moved inside a block changes it too.
+    gray_data = np.rint(get_downsampled_gray(img_data, factor)).astype(np.int64)
+    heigh, width = gray_data.shape
+    blocks_shape = (ceil(heigh / block_size), ceil(width / block_size))
+    padded_data = np.zeros(
+        (blocks_shape[0] * block_size, blocks_shape[1] * block_size), dtype=np.int64
+    )
+    padded_data[:heigh, :width] = gray_data
+    blocks = padded_data.reshape(
+        blocks_shape[0], block_size, blocks_shape[1], block_size
+    )
+
+    weights = np.arange(1, block_size * block_size + 1).reshape(
+        1, block_size, 1, block_size
+    )
+    return np.stack(
+        (blocks.sum(axis=(1, 3)), (blocks * weights).sum(axis=(1, 3))), axis=2
+    )
+
+
+def get_fast_sizes(size):
+    # 2^a * 3^b * 5^c numbers, FFT is slow for large prime factors.
+    fast_sizes = []
+    power_2 = 1
+    while power_2 <= size:
+        power_3 = power_2
+        while power_3 <= size:
+            power_5 = power_3
+            while power_5 <= size:
+                fast_sizes.append(power_5)
+                power_5 *= 5
+            power_3 *= 3
+        power_2 *= 2
+
+    return fast_sizes
+
+
+def get_fast_size(size):
+    # Largest fast FFT length not above size.
+    return max(get_fast_sizes(size))
+
+
+def get_fast_length(size):
+    # Smallest fast FFT length not below size.
+    return min(fast_size for fast_size in get_fast_sizes(size * 2) if fast_size >= size)
+
+
+def get_min_confidence(pixels):
+    # Noise peak grows for small images, keep threshold well above it.
+    return max(MIN_SHIFT_CONFIDENCE, 6 / sqrt(max(pixels, 1)))
+
+
+def get_peak_offset(value_before, value_peak, value_after):
+    # Vertex of the parabola fitted through the peak and its neighbours.
+    denominator = value_before - 2 * value_peak + value_after
+    if denominator == 0:
+        return 0.0
+
+    return float(np.clip(0.5 * (value_before - value_after) / denominator, -0.5, 0.5))
+
+
+def get_phase_correlation(gray_1, gray_2):
+    # Returns (dx, dy, confidence): content at (x, y) of the first image is
+    # found at (x + dx, y + dy) of the second image. Images must be same size.
+    heigh, width = gray_1.shape
+    if heigh < 3 or width < 3:
+        return 0.0, 0.0, 0.0
+
+    # Hann window suppresses the edges, otherwise image borders dominate the peak.
+    window = np.outer(
+        np.hanning(heigh).astype(np.float32), np.hanning(width).astype(np.float32)
+    )
+    spectrum_1 = np.fft.rfft2((gray_1 - gray_1.mean()) * window)
+    spectrum_2 = np.fft.rfft2((gray_2 - gray_2.mean()) * window)
+
+    cross_power = spectrum_2 * np.conj(spectrum_1)
+    cross_power /= np.abs(cross_power) + 1e-9
+    correlation = np.fft.irfft2(cross_power, s=(heigh, width))
+
+    peak_y, peak_x = np.unravel_index(np.argmax(correlation), correlation.shape)
+    confidence = float(correlation[peak_y, peak_x])
+
+    offset_x = get_peak_offset(
+        correlation[peak_y, peak_x - 1],
+        correlation[peak_y, peak_x],
+        correlation[peak_y, (peak_x + 1) % width],
+    )
+    offset_y = get_peak_offset(
+        correlation[peak_y - 1, peak_x],
+        correlation[peak_y, peak_x],
+        correlation[(peak_y + 1) % heigh, peak_x],
+    )
+
+    # Correlation is circular, upper half of indices are negative shifts.
+    shift_x = peak_x - width if peak_x > width // 2 else peak_x
+    shift_y = peak_y - heigh if peak_y > heigh // 2 else peak_y
+
+    return float(shift_x + offset_x), float(shift_y + offset_y), confidence
+
+
+def get_overlap_score(gray_1, gray_2, shift_x, shift_y):
+    # Normalized cross-correlation of the overlap of two images placed at the
+    # integer shift, 0.0 if the overlap is too small or flat.
+    heigh, width = gray_1.shape
+    left = max(0, -shift_x)
+    right = min(width, width - shift_x)
+    top = max(0, -shift_y)
+    bottom = min(heigh, heigh - shift_y)
+    if right <= left or bottom <= top:
+        return 0.0
+    if (right - left) * (bottom - top) < heigh * width * MIN_SHIFT_OVERLAP:
+        return 0.0
+
+    overlap_1 = gray_1[top:bottom, left:right]
+    overlap_2 = gray_2[
+        top + shift_y : bottom + shift_y, left + shift_x : right + shift_x
+    ]
+    overlap_1 = overlap_1 - overlap_1.mean(dtype=np.float64)
+    overlap_2 = overlap_2 - overlap_2.mean(dtype=np.float64)
+    norm_1 = float(np.sum(overlap_1 * overlap_1))
+    norm_2 = float(np.sum(overlap_2 * overlap_2))
+    # Flat areas match anything, same as in get_match_scores.
+    if norm_1 <= overlap_1.size or norm_2 <= overlap_2.size:
+        return 0.0
+
+    return float(np.sum(overlap_1 * overlap_2)) / sqrt(norm_1 * norm_2)
+
+
+def get_verified_shift(gray_1, gray_2, shift_x, shift_y):
+    # Picks the direct or wrapped around shift with the best matching
+    # overlap, None if neither matches.
+    heigh, width = gray_1.shape
+    candidates_x = [
+        candidate
+        for candidate in (shift_x, shift_x - width, shift_x + width)
+        if abs(candidate) < width
+    ]
+    candidates_y = [
+        candidate
+        for candidate in (shift_y, shift_y - heigh, shift_y + heigh)
+        if abs(candidate) < heigh
+    ]
+    score, shift_x, shift_y = max(
+        (
+            get_overlap_score(
+                gray_1, gray_2, int(round(candidate_x)), int(round(candidate_y))
+            ),
+            candidate_x,
+            candidate_y,
+        )
+        for candidate_x in candidates_x
+        for candidate_y in candidates_y
+    )
+    if score < MIN_MATCH_SCORE:
+        return None
+
+    return shift_x, shift_y
+
+
+def get_refined_shift(img_data_1, img_data_2, shift_x, shift_y):
+    # Correlates a patch from the middle of the overlap of two images placed
+    # at the estimated shift, the residual shift is within a few pixels.
+    int_shift_x = int(round(shift_x))
+    int_shift_y = int(round(shift_y))
+
+    left = max(0, -int_shift_x)
+    right = min(img_data_1.shape[1], img_data_2.shape[1] - int_shift_x)
+    top = max(0, -int_shift_y)
+    bottom = min(img_data_1.shape[0], img_data_2.shape[0] - int_shift_y)
+    half_width = min(REFINE_PATCH_SIZE, right - left) // 2
+    half_heigh = min(REFINE_PATCH_SIZE, bottom - top) // 2
+    if half_width < 8 or half_heigh < 8:
+        return shift_x, shift_y
+
+    center_x = (left + right) // 2
+    center_y = (top + bottom) // 2
+    patch_1 = img_data_1[
+        center_y - half_heigh : center_y + half_heigh,
+        center_x - half_width : center_x + half_width,
+    ]
+    patch_2 = img_data_2[
+        center_y + int_shift_y - half_heigh : center_y + int_shift_y + half_heigh,
+        center_x + int_shift_x - half_width : center_x + int_shift_x + half_width,
+    ]
+
+    residual_x, residual_y, confidence = get_phase_correlation(
+        get_gray_data(patch_1), get_gray_data(patch_2)
+    )
+    if confidence < get_min_confidence(patch_1.shape[0] * patch_1.shape[1]):
+        # Patch has no usable details, keep the coarse estimate.
+        return shift_x, shift_y
+
+    return int_shift_x + residual_x, int_shift_y + residual_y
+
+
+def get_image_shift(img_data_1, img_data_2):
+    # Returns (dx, dy, confidence) or None if images do not match confidently.
+    heigh = min(img_data_1.shape[0], img_data_2.shape[0])
+    width = min(img_data_1.shape[1], img_data_2.shape[1])
+    img_data_1 = img_data_1[:heigh, :width]
+    img_data_2 = img_data_2[:heigh, :width]
+
+    factor = max(1, ceil(sqrt(heigh * width / MAX_PHASE_PIXELS)))
+    gray_1 = get_downsampled_gray(img_data_1, factor)
+    gray_2 = get_downsampled_gray(img_data_2, factor)
+    fast_heigh = get_fast_size(gray_1.shape[0])
+    fast_width = get_fast_size(gray_1.shape[1])
+    gray_1 = gray_1[:fast_heigh, :fast_width]
+    gray_2 = gray_2[:fast_heigh, :fast_width]
+    shift_x, shift_y, confidence = get_phase_correlation(gray_1, gray_2)
+    if confidence < get_min_confidence(gray_1.size):
+        return None
+    verified_shift = get_verified_shift(gray_1, gray_2, shift_x, shift_y)
+    if verified_shift is None:
+        return None
+
+    shift_x, shift_y = verified_shift
+    shift_x *= factor
+    shift_y *= factor
+    if factor > 1:
+        shift_x, shift_y = get_refined_shift(img_data_1, img_data_2, shift_x, shift_y)
+
+    return shift_x, shift_y, confidence
+
+
+def is_near_shift(image_shift, width, heigh):
+    return (
+        abs(image_shift[0]) <= width * MAX_NEAR_SHIFT
+        and abs(image_shift[1]) <= heigh * MAX_NEAR_SHIFT
+    )
+
+
+def get_box_sums(data, box_heigh, box_width, dtype=np.float64):
+    # Sums of every box_heigh x box_width window fully inside data, of every
+    # image when data is a stack of images. Sums of rows are updated row by
+    # row, numpy accumulates across rows much slower than along them.
+    # Unsigned integer sums may wrap around, window sums are still exact
+    # while they fit into dtype.
+    heigh, width = data.shape[-2:]
+    row_sums = np.empty(data.shape[:-2] + (heigh - box_heigh + 1, width), dtype=dtype)
+    row_sums[..., 0, :] = data[..., :box_heigh, :].sum(axis=-2, dtype=dtype)
+    for row in range(1, heigh - box_heigh + 1):
+        np.add(
+            row_sums[..., row - 1, :],
+            data[..., row + box_heigh - 1, :],
+            out=row_sums[..., row, :],
+        )
+        row_sums[..., row, :] -= data[..., row - 1, :]
+
+    np.cumsum(row_sums, axis=-1, dtype=dtype, out=row_sums)
+    box_sums = row_sums[..., box_width - 1 :].copy()
+    box_sums[..., 1:] -= row_sums[..., : width - box_width]
+    return box_sums
+
+
+def get_match_scores(gray_image, gray_template):
+    # Normalized cross-correlation of template at every position where it
+    # fits into image, numerator by FFT and local variance by box sums.
+    template_heigh, template_width = gray_template.shape
+    fft_shape = (
+        get_fast_length(gray_image.shape[0]),
+        get_fast_length(gray_image.shape[1]),
+    )
+    # Double precision and zero mean, otherwise rounding errors of the whole
+    # image sum outweigh correlation of low contrast areas.
+    image = gray_image - gray_image.mean(dtype=np.float64)
+    template = gray_template - gray_template.mean(dtype=np.float64)
+    template_norm = float(np.sum(template * template))
+
+    correlation = np.fft.irfft2(
+        np.fft.rfft2(image, s=fft_shape) * np.conj(np.fft.rfft2(template, s=fft_shape)),
+        s=fft_shape,
+    )
+    scores_heigh = gray_image.shape[0] - template_heigh + 1
+    scores_width = gray_image.shape[1] - template_width + 1
+    correlation = correlation[:scores_heigh, :scores_width]
+
+    pixels = template_heigh * template_width
+    image_sums = get_box_sums(image, template_heigh, template_width)
+    image_squares = get_box_sums(np.square(image), template_heigh, template_width)
+    image_norm = image_squares - image_sums * image_sums / pixels
+
+    # Flat areas match any flat template, they are not a usable position.
+    scores = np.zeros_like(image_norm)
+    usable = (image_norm > pixels) & (template_norm > pixels)
+    scores[usable] = correlation[usable] / np.sqrt(image_norm[usable] * template_norm)
+    return scores
+
+
+def get_best_match(scores):
+    peak_y, peak_x = np.unravel_index(np.argmax(scores), scores.shape)
+    offset_x = offset_y = 0.0
+    if 0 < peak_x < scores.shape[1] - 1:
+        offset_x = get_peak_offset(*scores[peak_y, peak_x - 1 : peak_x + 2])
+    if 0 < peak_y < scores.shape[0] - 1:
+        offset_y = get_peak_offset(*scores[peak_y - 1 : peak_y + 2, peak_x])
+
+    return int(peak_x), int(peak_y), offset_x, offset_y, float(scores[peak_y, peak_x])
+
+
+def get_template_position(template_data, img_data):
+    # Coarse to fine search of template in image. Returns (x, y, score) of
+    # template top left corner in image or None if there is no confident match.
+    template_heigh, template_width = template_data.shape[:2]
+    image_heigh, image_width = img_data.shape[:2]
+    if template_heigh > image_heigh or template_width > image_width:
+        return None
+
+    # Coarsest level is small enough for a full FFT search and the template
+    # still keeps some details.
+    factor = 1
+    while (
+        image_heigh * image_width > MAX_PHASE_PIXELS * factor * factor
+        and min(template_heigh, template_width) >= PYRAMID_MIN_TEMPLATE * factor * 2
+    ):
+        factor *= 2
+
+    scores = get_match_scores(
+        get_downsampled_gray(img_data, factor),
+        get_downsampled_gray(template_data, factor),
+    )
+    position_x, position_y, offset_x, offset_y, score = get_best_match(scores)
+    position_x *= factor
+    position_y *= factor
+
+    # Every finer level searches only a small window around the estimate.
+    while factor > 1:
+        factor //= 2
+        radius = PYRAMID_SEARCH_RADIUS * factor
+        left = max(position_x - radius, 0)
+        top = max(position_y - radius, 0)
+        right = min(position_x + template_width + radius, image_width)
+        bottom = min(position_y + template_heigh + radius, image_heigh)
+
+        scores = get_match_scores(
+            get_downsampled_gray(img_data[top:bottom, left:right], factor),
+            get_downsampled_gray(template_data, factor),
+        )
+        position_x, position_y, offset_x, offset_y, score = get_best_match(scores)
+        position_x = left + position_x * factor
+        position_y = top + position_y * factor
+
+    if score < MIN_MATCH_SCORE:
+        return None
+
+    return position_x + offset_x, position_y + offset_y, score
+
+
+class TesseractOcr:
+    # Keeps Tesseract with loaded language data between calls when
+    # libtesseract is available, otherwise runs tesseract binary for every
+    # image. Tesseract 3.03 and newer gets image through stdin and returns
+    # text through stdout, older versions, as bundled 3.02, read and write
+    # files in tmp_path.
+    def __init__(self, tesseract_path, language="eng", tmp_path=None):
+        self.tesseract_path = tesseract_path
+        self.language = language
+        self.tmp_path = tmp_path
+        self.lock = Lock()
+        self.library = None
+        # Initialized APIs which are not used by any thread at the moment.
+        self.free_apis = []
+        self.is_piped = False
+        self.file_ids = count()
+
+        try:
+            self.init_library()
+            self.free_apis.append(self.create_api())
+        except (OSError, AttributeError):
+            self.library = None
+        if self.library is None:
+            self.is_piped = self.get_version() >= (3, 3)
+
+    def get_version(self):
+        # Version is printed to stderr by older and to stdout by newer
+        # versions, (0, 0) if it is unknown.
+        try:
+            version_proc = Popen(
+                [self.tesseract_path, "-v"],
+                stdout=PIPE,
+                stderr=STDOUT,
+                creationflags=self.get_creation_flags(),
+            )
+            version_text, _ = version_proc.communicate()
+        except OSError:
+            return 0, 0
+
+        version_match = re.search(
+            rb"tesseract\s+v?(\d+)\.(\d+)", version_text, re.IGNORECASE
+        )
+        if version_match is None:
+            return 0, 0
+
+        return int(version_match.group(1)), int(version_match.group(2))
+
+    def get_creation_flags(self):
+        # No console window flashes on Windows.
+        return 0x08000000 if sys.platform == "win32" else 0
+
+    def get_library_paths(self):
+        from ctypes.util import find_library
+
+        library_paths = []
+        tesseract_directory = path.dirname(self.tesseract_path)
+        if tesseract_directory and path.isdir(tesseract_directory):
+            for file_name in sorted(listdir(tesseract_directory)):
+                if file_name.lower().startswith(
+                    ("libtesseract", "tesseract")
+                ) and file_name.lower().endswith(".dll"):
+                    library_paths.append(path.join(tesseract_directory, file_name))
+        library_path = find_library("tesseract")
+        if library_path:
+            library_paths.append(library_path)
+
+        return library_paths
+
+    def init_library(self):
+        import ctypes
+
+        for library_path in self.get_library_paths():
+            try:
+                self.library = ctypes.CDLL(library_path)
+                break
+            except OSError:
+                continue
+        if self.library is None:
+            raise OSError("libtesseract is not found.")
+
+        self.library.TessBaseAPICreate.restype = ctypes.c_void_p
+        self.library.TessBaseAPIInit3.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.c_char_p,
+        ]
+        self.library.TessBaseAPISetImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+        ]
+        self.library.TessBaseAPISetSourceResolution.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int,
+        ]
+        self.library.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        self.library.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        self.library.TessDeleteText.argtypes = [ctypes.c_void_p]
+        self.library.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        self.library.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+
+    def create_api(self):
+        # Bundled language data is used if it is next to tesseract binary.
+        tessdata_path = path.join(path.dirname(self.tesseract_path), "tessdata")
+        data_path = (
+            (tessdata_path + "/").encode() if path.isdir(tessdata_path) else None
+        )
+
+        api = self.library.TessBaseAPICreate()
+        if self.library.TessBaseAPIInit3(api, data_path, self.language.encode()) != 0:
+            self.library.TessBaseAPIDelete(api)
+            raise OSError("Tesseract language data is not found.")
+
+        return api
+
+    def get_text(self, img_data):
+        # Safe to call from several threads, every thread gets its own API.
+        img_data = np.ascontiguousarray(img_data, dtype=np.uint8)
+        if self.library is None and self.is_piped:
+            return self.get_process_text(img_data)
+        if self.library is None:
+            return self.get_file_text(img_data)
+
+        with self.lock:
+            api = self.free_apis.pop() if self.free_apis else None
+        if api is None:
+            api = self.create_api()
+        try:
+            return self.get_api_text(api, img_data)
+        finally:
+            with self.lock:
+                self.free_apis.append(api)
+
+    def get_api_text(self, api, img_data):
+        import ctypes
+
+        heigh, width = img_data.shape[:2]
+        self.library.TessBaseAPISetImage(
+            api, img_data.ctypes.data, width, heigh, 3, width * 3
+        )
+        # Same resolution as tesseract binary assumes for images without one.
+        self.library.TessBaseAPISetSourceResolution(api, 70)
+        text_pointer = self.library.TessBaseAPIGetUTF8Text(api)
+        if not text_pointer:
+            raise OSError("Tesseract failed to recognize image.")
+
+        try:
+            return ctypes.string_at(text_pointer).decode("utf8", errors="replace")
+        finally:
+            self.library.TessDeleteText(text_pointer)
+
+    def get_process_text(self, img_data):
+        image_file = BytesIO()
+        img.fromarray(img_data, "RGB").save(image_file, format="PNG", compress_level=1)
+
+        ocr_proc = Popen(
+            [self.tesseract_path, "stdin", "stdout", "-l", self.language],
+            stdin=PIPE,
+            stdout=PIPE,
+            stderr=DEVNULL,
+            creationflags=self.get_creation_flags(),
+        )
+        image_text, _ = ocr_proc.communicate(image_file.getvalue())
+        if ocr_proc.returncode != 0:
+            raise OSError("Tesseract failed to recognize image.")
+
+        return image_text.decode("utf8", errors="replace")
+
+    def get_file_text(self, img_data):
+        # Every call gets its own files, bands are recognized in parallel.
+        with self.lock:
+            file_id = next(self.file_ids)
+        tmp_path = self.tmp_path or path.dirname(path.abspath(self.tesseract_path))
+        tmp_text_path = path.join(tmp_path, f"ocr_{file_id}")
+        tmp_img_path = tmp_text_path + ".png"
+        img.fromarray(img_data, "RGB").save(
+            tmp_img_path, format="PNG", compress_level=1
+        )
+
+        try:
+            ocr_proc = Popen(
+                [
+                    self.tesseract_path,
+                    tmp_img_path,
+                    tmp_text_path,
+                    "-l",
+                    self.language,
+                ],
+                stdout=DEVNULL,
+                stderr=DEVNULL,
+                creationflags=self.get_creation_flags(),
+            )
+            if ocr_proc.wait() != 0:
+                raise OSError("Tesseract failed to recognize image.")
+
+            with open(
+                tmp_text_path + ".txt", encoding="utf8", errors="replace"
+            ) as text_file:
+                return text_file.read()
+        finally:
+            for file_path in (tmp_img_path, tmp_text_path + ".txt"):
+                try:
+                    remove(file_path)
+                except OSError:
+                    pass
+
+    def close(self):
+        # APIs used by running get_text calls are left to the process exit.
+        with self.lock:
+            while self.free_apis:
+                api = self.free_apis.pop()
+                self.library.TessBaseAPIEnd(api)
+                self.library.TessBaseAPIDelete(api)
+
+
+def get_text_bands(img_data, band_count):
+    # Returns (top, bottom) rows of bands with text, bands are at least
+    # heigh / band_count rows high, so tesseract runs only a few times.
+    heigh = img_data.shape[0]
+    if heigh < 2:
+        return [(0, heigh)]
+
+    row_delta = np.abs(np.diff(get_gray_data(img_data), axis=0)).max(axis=1)
+    row_changes = row_delta > OCR_INK_THRESHOLD
+    ink_rows = np.zeros(heigh, dtype=bool)
+    ink_rows[:-1] |= row_changes
+    ink_rows[1:] |= row_changes
+    if not ink_rows.any():
+        return []
+
+    # Starts and ends of blank row runs.
+    edges = np.diff(np.concatenate(([1], ink_rows.view(np.int8), [1])))
+    gap_starts = np.flatnonzero(edges == -1)
+    gap_ends = np.flatnonzero(edges == 1)
+    gap_cuts = [
+        int(gap_start + gap_end) // 2
+        for gap_start, gap_end in zip(gap_starts, gap_ends)
+        if gap_end - gap_start >= OCR_BAND_GAP and 0 < gap_start and gap_end < heigh
+    ]
+
+    min_band_heigh = max(OCR_BAND_MIN_HEIGH, heigh // max(band_count, 1))
+    bands = []
+    band_top = 0
+    for gap_cut in gap_cuts:
+        if (
+            gap_cut - band_top >= min_band_heigh
+            and heigh - gap_cut >= OCR_BAND_MIN_HEIGH
+        ):
+            bands.append((band_top, gap_cut))
+            band_top = gap_cut
+    bands.append((band_top, heigh))
+
+    return [(top, bottom) for top, bottom in bands if ink_rows[top:bottom].any()]
+
+
+def get_bands_text(ocr, img_data, executor, band_count):
+    # Bands are recognized concurrently and joined from top to bottom.
+    band_texts = executor.map(
+        lambda band: ocr.get_text(img_data[band[0] : band[1]]),
+        get_text_bands(img_data, band_count),
+    )
+
+    return "\n".join(text.strip() for text in band_texts if text.strip()) + "\n"
+
+
+def get_changed_regions(mask, tile_size=OCR_REGION_TILE_SIZE):
+    # Returns (left, top, right, bottom) boxes of 8-connected changed tiles,
+    # largest regions first.
+    heigh, width = mask.shape
+    tiles_shape = (ceil(heigh / tile_size), ceil(width / tile_size))
+    padded_mask = np.zeros(
+        (tiles_shape[0] * tile_size, tiles_shape[1] * tile_size), dtype=bool
+    )
+    padded_mask[:heigh, :width] = mask
+    tiles = padded_mask.reshape(
+        tiles_shape[0], tile_size, tiles_shape[1], tile_size
+    ).any(axis=(1, 3))
+
+    tile_boxes, _ = get_mask_regions(tiles)
+    regions = [
+        (
+            left * tile_size,
+            top * tile_size,
+            min(right * tile_size, width),
+            min(bottom * tile_size, heigh),
+        )
+        for left, top, right, bottom in tile_boxes.tolist()
+    ]
+
+    return sorted(
+        regions,
+        key=lambda region: (region[2] - region[0]) * (region[3] - region[1]),
+        reverse=True,
+    )
+
+
+def get_changes_text(ocr, img_data_1, img_data_2, comparison_strenght, executor):
+    # Recognizes only regions changed on heatmap, in both images.
+    heigh = min(img_data_1.shape[0], img_data_2.shape[0])
+    width = min(img_data_1.shape[1], img_data_2.shape[1])
+    img_data_1 = img_data_1[:heigh, :width]
+    img_data_2 = img_data_2[:heigh, :width]
+
+    heatmap_data = HeatmapDiff().calculate(img_data_1, img_data_2, comparison_strenght)
+    regions = get_changed_regions(heatmap_data[:, :, 0] > 0)[:OCR_MAX_REGIONS]
+    if not regions:
+        return "No changes found.\n"
+
+    # Reading order, top to bottom and left to right.
+    regions.sort(key=lambda region: (region[1], region[0]))
+    crops = []
+    for left, top, right, bottom in regions:
+        left = max(left - OCR_REGION_MARGIN, 0)
+        top = max(top - OCR_REGION_MARGIN, 0)
+        right = min(right + OCR_REGION_MARGIN, width)
+        bottom = min(bottom + OCR_REGION_MARGIN, heigh)
+        crops.append(img_data_1[top:bottom, left:right])
+        crops.append(img_data_2[top:bottom, left:right])
+    crop_texts = list(executor.map(ocr.get_text, crops))
+
+    changes_text = ""
+    for index, (left, top, right, bottom) in enumerate(regions):
+        text_1 = crop_texts[index * 2].strip()
+        text_2 = crop_texts[index * 2 + 1].strip()
+        if text_1 == text_2:
+            continue
+
+        changes_text += (
+            f"Region {index + 1} at {left}, {top} ({right - left}x{bottom - top}):\n"
+            f"Before: {text_1}\nAfter: {text_2}\n\n"
+        )
+
+    return changes_text or "No text changes found.\n"
+
+
+def get_tesseract_path(ocr_path):
+    # DETAILIST_TESSERACT overrides bundled tesseract, tesseract from PATH is
+    # used when there is no bundled one.
+    tesseract_path = environ.get("DETAILIST_TESSERACT")
+    if tesseract_path:
+        return tesseract_path
+
+    bundled_path = path.join(ocr_path, "tesseract.exe")
+    if sys.platform == "win32" and path.isfile(bundled_path):
+        return bundled_path
+
+    return which("tesseract") or bundled_path
@@ -0,0 +1,197 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import zlib
+from collections import OrderedDict
+from glob import glob
+from os import getpid, makedirs, path, remove, rmdir
+from threading import Lock
+
+import numpy as np
+
+HISTORY_COMPRESS_LEVEL = 1
+
+
+def remove_spill_files(spill_path):
+    # Files are left when the app crashed or a file was still memory-mapped
+    # on removal, Windows does not delete mapped files.
+    for spill_file in glob(path.join(spill_path, "history_*.raw")) + glob(
+        path.join(spill_path, "history_*", "*.raw")
+    ):
+        try:
+            remove(spill_file)
+        except OSError:
+            pass
+    for spill_directory in glob(path.join(spill_path, "history_*", "")):
+        try:
+            rmdir(spill_directory)
+        except OSError:
+            pass
+
+
+class CaptureHistory:
+    # Ring buffer of captured screenshots. The newest screenshots are kept as
+    # arrays up to max_size bytes, older ones are compressed with zlib up to
+    # max_compressed_size bytes, the rest is spilled to files in a session
+    # directory of spill_path and read back memory-mapped. Only max_count
+    # screenshots are kept. Safe to use from several threads.
+    def __init__(self, max_count, max_size, max_compressed_size, spill_path):
+        self.max_count = max_count
+        self.max_size = max_size
+        self.max_compressed_size = max_compressed_size
+        # Ids start from 1 every session, files of previous sessions are
+        # removed and never reused.
+        remove_spill_files(spill_path)
+        self.spill_path = path.join(spill_path, f"history_{getpid()}")
+        self.entries = OrderedDict()
+        self.entry_count = 0
+        self.size = 0
+        self.compressed_size = 0
+        self.lock = Lock()
+        # Only one thread compresses and spills at a time, an entry is never
+        # compressed or spilled twice.
+        self.budget_lock = Lock()
+
+    def add(self, img_data, capture_box=None, capture_time=None):
+        # Returns id of the new entry.
+        with self.lock:
+            self.entry_count += 1
+            entry_id = self.entry_count
+            self.entries[entry_id] = {
+                "id": entry_id,
+                "shape": img_data.shape,
+                "capture_box": capture_box,
+                "capture_time": capture_time,
+                "img_data": img_data,
+                "compressed_data": None,
+                "spill_file": None,
+            }
+            self.size += img_data.nbytes
+
+            while len(self.entries) > self.max_count:
+                self.remove_entry(next(iter(self.entries.values())))
+
+        self.apply_budget()
+        return entry_id
+
+    def get(self, entry_id):
+        # Returns RGB array of the entry, None if it is not in history.
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                return None
+            if entry["img_data"] is not None:
+                return entry["img_data"]
+            compressed_data = entry["compressed_data"]
+            spill_file = entry["spill_file"]
+            shape = entry["shape"]
+
+        if compressed_data is not None:
+            return np.frombuffer(
+                zlib.decompress(compressed_data), dtype=np.uint8
+            ).reshape(shape)
+
+        return np.memmap(spill_file, dtype=np.uint8, mode="r", shape=shape)
+
+    def get_entries(self):
+        # Returns entry descriptions from the oldest to the newest.
+        with self.lock:
+            return [
+                {
+                    "id": entry["id"],
+                    "shape": entry["shape"],
+                    "capture_box": entry["capture_box"],
+                    "capture_time": entry["capture_time"],
+                }
+                for entry in self.entries.values()
+            ]
+
+    def apply_budget(self):
+        with self.budget_lock:
+            self.compress_entries()
+            self.spill_entries()
+
+    def compress_entries(self):
+        # Arrays are compressed and spilled outside of the lock, so get and
+        # add are not blocked by zlib or disk. Entries may be removed
+        # meanwhile.
+        while True:
+            with self.lock:
+                entry = self.get_oldest_entry("img_data", self.size, self.max_size)
+            if entry is None:
+                break
+
+            compressed_data = zlib.compress(entry["img_data"], HISTORY_COMPRESS_LEVEL)
+            with self.lock:
+                if entry["id"] in self.entries and entry["img_data"] is not None:
+                    self.size -= entry["img_data"].nbytes
+                    self.compressed_size += len(compressed_data)
+                    entry["compressed_data"] = compressed_data
+                    entry["img_data"] = None
+
+    def spill_entries(self):
+        while True:
+            with self.lock:
+                entry = self.get_oldest_entry(
+                    "compressed_data", self.compressed_size, self.max_compressed_size
+                )
+            if entry is None:
+                break
+
+            makedirs(self.spill_path, exist_ok=True)
+            spill_file = path.join(self.spill_path, f"{entry['id']}.raw")
+            with open(spill_file, "wb") as history_file:
+                history_file.write(zlib.decompress(entry["compressed_data"]))
+            with self.lock:
+                if (
+                    entry["id"] in self.entries
+                    and entry["compressed_data"] is not None
+                ):
+                    self.compressed_size -= len(entry["compressed_data"])
+                    entry["spill_file"] = spill_file
+                    entry["compressed_data"] = None
+                else:
+                    remove(spill_file)
+
+    def get_oldest_entry(self, data_key, size, max_size):
+        # The newest entry always stays as an array.
+        if size <= max_size:
+            return None
+
+        for entry in list(self.entries.values())[:-1]:
+            if entry[data_key] is not None:
+                return entry
+
+        return None
+
+    def remove_entry(self, entry):
+        del self.entries[entry["id"]]
+        if entry["img_data"] is not None:
+            self.size -= entry["img_data"].nbytes
+        if entry["compressed_data"] is not None:
+            self.compressed_size -= len(entry["compressed_data"])
+        if entry["spill_file"] is not None:
+            try:
+                remove(entry["spill_file"])
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            for entry in list(self.entries.values()):
+                self.remove_entry(entry)
+            try:
+                rmdir(self.spill_path)
+            except OSError:
+                pass
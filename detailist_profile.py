@@ -0,0 +1,117 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from threading import Lock, local
+from time import perf_counter, time
+
+# Durations kept for summary of every operation stage.
+PROFILE_HISTORY = 200
+
+
+class Profiler:
+    # Times named stages of operations. An operation is timed in one thread,
+    # stages record into the operation running in the calling thread and do
+    # nothing outside of operations. Finished operations are kept for the
+    # summary and appended to log_path as JSON lines.
+    #
+    # Memory tracing makes every allocation slower. Traced peak is global, so
+    # it includes allocations of other threads running at the same time.
+    def __init__(self, log_path=None, is_memory_traced=False):
+        self.log_path = log_path
+        self.is_memory_traced = is_memory_traced
+        self.durations = defaultdict(lambda: deque(maxlen=PROFILE_HISTORY))
+        self.memory_peaks = defaultdict(float)
+        self.lock = Lock()
+        self.current = local()
+        if is_memory_traced:
+            tracemalloc.start()
+
+    @contextmanager
+    def operation(self, name):
+        previous_record = getattr(self.current, "record", None)
+        record = {"operation": name, "time": time(), "stages": {}}
+        self.current.record = record
+        if self.is_memory_traced:
+            # Nested operation keeps the peak of the outer one, its own peak
+            # then includes memory of the outer operation.
+            if previous_record is None:
+                tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            record["total_ms"] = (perf_counter() - start) * 1000
+            if self.is_memory_traced:
+                record["peak_mb"] = (
+                    (tracemalloc.get_traced_memory()[1] - start_memory) / 1024 / 1024
+                )
+            self.current.record = previous_record
+            self.add_record(record)
+
+    @contextmanager
+    def stage(self, name):
+        record = getattr(self.current, "record", None)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            if record is not None:
+                record["stages"][name] = (
+                    record["stages"].get(name, 0) + (perf_counter() - start) * 1000
+                )
+
+    def add_record(self, record):
+        operation = record["operation"]
+        with self.lock:
+            self.durations[(operation, "total")].append(record["total_ms"])
+            for stage, duration in record["stages"].items():
+                self.durations[(operation, stage)].append(duration)
+            if "peak_mb" in record:
+                self.memory_peaks[operation] = max(
+                    self.memory_peaks[operation], record["peak_mb"]
+                )
+
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf8") as log_file:
+                        log_file.write(json.dumps(record) + "\n")
+                except OSError:
+                    self.log_path = None
+
+    def get_summary(self):
+        # One line per operation stage: count, median, 90th percentile and
+        # max duration in ms of the last PROFILE_HISTORY runs.
+        summary_lines = []
+        with self.lock:
+            for operation, stage in sorted(
+                self.durations, key=lambda key: (key[0], key[1] != "total", key[1])
+            ):
+                durations = sorted(self.durations[(operation, stage)])
+                summary_line = (
+                    f"{operation}.{stage}: {len(durations)}x"
+                    f" p50 {durations[len(durations) // 2]:.1f}"
+                    f" p90 {durations[int(len(durations) * 0.9)]:.1f}"
+                    f" max {durations[-1]:.1f} ms"
+                )
+                if stage == "total" and operation in self.memory_peaks:
+                    summary_line += f", peak {self.memory_peaks[operation]:.1f} MB"
+                summary_lines.append(summary_line)
+
+        return "\n".join(summary_lines) or "Nothing was timed yet."
@@ -0,0 +1,97 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Event, Thread
+from time import monotonic
+from traceback import print_exc
+
+import numpy as np
+
+from detailist_capture import grab_screen
+from detailist_core import HeatmapDiff, get_block_fingerprints, get_diff_metrics
+
+
+class ScreenWatch:
+    # Captures capture_box frame_rate times per second in a background thread
+    # and calls on_change with frames which differ from the baseline in at
+    # least min_changed_pixels heatmap pixels. Block fingerprints of
+    # downsampled frames are compared first, heatmap is calculated only when
+    # changed blocks differ from the last alert.
+    def __init__(
+        self,
+        baseline_data,
+        capture_box,
+        frame_rate,
+        comparison_strenght,
+        min_changed_pixels,
+        on_change,
+    ):
+        self.baseline_data = baseline_data
+        self.capture_box = capture_box
+        self.frame_interval = 1 / frame_rate
+        self.comparison_strenght = comparison_strenght
+        self.min_changed_pixels = min_changed_pixels
+        self.on_change = on_change
+        self.stop_event = Event()
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        heatmap_diff = HeatmapDiff()
+        baseline_fingerprints = get_block_fingerprints(self.baseline_data)
+        frame_fingerprints = baseline_fingerprints
+        alert_blocks = None
+
+        frame_time = monotonic()
+        while not self.stop_event.wait(max(frame_time - monotonic(), 0)):
+            # Slow frames are not caught up, the next one waits a full interval.
+            frame_time = max(frame_time + self.frame_interval, monotonic())
+            try:
+                frame_data = grab_screen(self.capture_box)
+                if frame_data.shape != self.baseline_data.shape:
+                    continue
+
+                fingerprints = get_block_fingerprints(frame_data)
+                if np.array_equal(fingerprints, frame_fingerprints):
+                    continue
+                frame_fingerprints = fingerprints
+
+                changed_blocks = (fingerprints != baseline_fingerprints).any(axis=2)
+                if not changed_blocks.any():
+                    alert_blocks = None
+                    continue
+                if alert_blocks is not None and np.array_equal(
+                    changed_blocks, alert_blocks
+                ):
+                    continue
+
+                heatmap_data = heatmap_diff.calculate(
+                    self.baseline_data, frame_data, self.comparison_strenght
+                )
+                changes_mask = heatmap_data[:, :, 0] > 0
+                diff_metrics = get_diff_metrics(
+                    heatmap_diff.magnitude, changes_mask, False
+                )
+                if diff_metrics["changed_pixels"] < self.min_changed_pixels:
+                    continue
+                diff_metrics = get_diff_metrics(heatmap_diff.magnitude, changes_mask)
+
+                alert_blocks = changed_blocks
+                self.on_change(frame_data, self.capture_box, diff_metrics)
+            except Exception:  # pylint: disable=broad-except
+                print_exc()
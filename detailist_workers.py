@@ -0,0 +1,98 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from queue import Queue
+from threading import Condition, Thread
+from traceback import print_exc
+
+
+class LatestWorker:
+    # Runs task in a background thread for the newest submitted request only,
+    # requests submitted while task is busy replace each other.
+    def __init__(self, task, on_result):
+        self.task = task
+        self.on_result = on_result
+        self.condition = Condition()
+        self.pending_request = None
+        self.is_running = True
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, request):
+        with self.condition:
+            self.pending_request = request
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.is_running = False
+            self.pending_request = None
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending_request is None and self.is_running:
+                    self.condition.wait()
+                if not self.is_running:
+                    return
+
+                request = self.pending_request
+                self.pending_request = None
+
+            try:
+                result = self.task(request)
+            except Exception:  # pylint: disable=broad-except
+                print_exc()
+                continue
+
+            with self.condition:
+                if self.is_running:
+                    self.on_result(result)
+
+
+class QueueWorker:
+    # Runs task in a background thread for every submitted request, in the
+    # order of submission.
+    def __init__(self, task, on_result):
+        self.task = task
+        self.on_result = on_result
+        self.requests = Queue()
+        self.is_running = True
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, request):
+        self.requests.put(request)
+
+    def stop(self):
+        self.is_running = False
+        self.requests.put(None)
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None or not self.is_running:
+                return
+
+            try:
+                result = self.task(request)
+            except Exception:  # pylint: disable=broad-except
+                print_exc()
+                continue
+
+            if self.is_running:
+                self.on_result(result)
@@ -0,0 +1,113 @@
+# Copyright © 2021 Dima Beskrestnov
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Run: python -m pytest tests
+
+import sys
+from os import path
+
+import numpy as np
+import pytest
+
+ROOT_PATH = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+from detailist_core import (  # noqa: E402
+    get_image_shift,
+    get_template_position,
+    is_near_shift,
+)
+
+
+def get_page(width, heigh):
+    # White page with text-like lines and colored panels, nothing repeats.
+    random = np.random.default_rng(0)
+    img_data = np.full((heigh, width, 3), 255, dtype=np.uint8)
+    for _ in range(width * heigh // 40000):
+        left = int(random.integers(0, width - 200))
+        top = int(random.integers(0, heigh - 100))
+        img_data[top : top + 100, left : left + 200] = random.integers(0, 256, 3)
+    for line_top in range(8, heigh - 16, 24):
+        line_width = int(random.integers(width // 4, width - 16))
+        letters = random.random((12, line_width)) < 0.35
+        img_data[line_top : line_top + 12, 8 : 8 + line_width][letters] = 32
+
+    return img_data
+
+
+def get_viewports(page, size, shift_x, shift_y):
+    # Content at (x, y) of the first viewport is at (x + dx, y + dy) of the second.
+    left = top = 900
+    viewport_1 = page[top : top + size, left : left + size]
+    viewport_2 = page[
+        top - shift_y : top - shift_y + size, left - shift_x : left - shift_x + size
+    ]
+    return viewport_1, viewport_2
+
+
+@pytest.fixture(scope="module")
+def page():
+    return get_page(3000, 2400)
+
+
+@pytest.mark.parametrize(
+    "size, shift_x, shift_y",
+    [(300, 40, -30), (300, -151, 26), (720, 100, -50), (720, -388, 97)],
+)
+def test_image_shift(page, size, shift_x, shift_y):
+    image_shift = get_image_shift(*get_viewports(page, size, shift_x, shift_y))
+
+    assert image_shift is not None
+    assert image_shift[0] == pytest.approx(shift_x, abs=1)
+    assert image_shift[1] == pytest.approx(shift_y, abs=1)
+
+
+@pytest.mark.parametrize(
+    "size, shift_x, shift_y",
+    [
+        (300, -160, 0),
+        (300, -200, 0),
+        (300, -250, 0),
+        (300, 180, 0),
+        (300, 0, -170),
+        (300, 153, 92),
+        (720, 0, 450),
+        (720, -405, 0),
+    ],
+)
+def test_image_shift_over_half_viewport(page, size, shift_x, shift_y):
+    # Circular correlation also peaks at shift - size, a shift is either
+    # right or None.
+    image_shift = get_image_shift(*get_viewports(page, size, shift_x, shift_y))
+
+    if image_shift is not None:
+        assert image_shift[0] == pytest.approx(shift_x, abs=1)
+        assert image_shift[1] == pytest.approx(shift_y, abs=1)
+
+
+@pytest.mark.parametrize(
+    "size, shift_x, shift_y", [(300, -420, 0), (300, 350, -610), (720, -1000, 800)]
+)
+def test_template_position_over_viewport(page, size, shift_x, shift_y):
+    # Viewports do not overlap, Auto Center falls back to template search of
+    # the whole screenshot.
+    viewport_1, viewport_2 = get_viewports(page, size, shift_x, shift_y)
+    image_shift = get_image_shift(viewport_1, viewport_2)
+    assert image_shift is None or not is_near_shift(image_shift, size, size)
+
+    template_position = get_template_position(viewport_1, page)
+
+    assert template_position is not None
+    assert template_position[0] == pytest.approx(900, abs=1)
+    assert template_position[1] == pytest.approx(900, abs=1)